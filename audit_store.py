@@ -0,0 +1,114 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# --- HISTÓRICO DE AUDITORIAS (SQLite) ---
+# Guarda o último resultado de cada reserva (por Confirmation Number) junto com a "impressão digital"
+# dos campos que influenciam a conferência, para que a próxima execução reconfira só o que mudou.
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_history.sqlite")
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_journal.sqlite")
+
+
+class AuditHistory:
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS last_results ("
+            " confirmation TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " decided_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, confirmations):
+        """Devolve {confirmation: (fingerprint, resultado)} para as reservas já conferidas."""
+        wanted = set(confirmations)
+        with self._lock:
+            rows = self._conn.execute("SELECT confirmation, fingerprint, result FROM last_results").fetchall()
+        return {conf: (fp, json.loads(result)) for conf, fp, result in rows if conf in wanted}
+
+    def save(self, confirmation, fingerprint, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO last_results (confirmation, fingerprint, result, decided_at) VALUES (?, ?, ?, ?)",
+                (confirmation, fingerprint, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- DIÁRIO DE EXECUÇÃO (SQLite) ---
+# Cada reserva decidida é gravada na hora, por execução (run_id) e Confirmation Number. Se o Chrome
+# cair ou a execução for interrompida, a retomada pula as reservas já finalizadas e confere só as
+# restantes e as que deram erro de busca/leitura.
+
+class RunJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY,"
+            " run_key TEXT NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_rows ("
+            " run_id TEXT NOT NULL,"
+            " confirmation TEXT NOT NULL,"
+            " row_index INTEGER NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " decided_at REAL NOT NULL,"
+            " PRIMARY KEY (run_id, confirmation))"
+        )
+        self._conn.commit()
+
+    def start_run(self, run_key, resume=False):
+        """
+        Abre uma execução para run_key (as datas conferidas). Com resume=True continua a última
+        execução com a mesma chave que não chegou ao fim; uma execução finalizada não é reaberta.
+        Devolve (run_id, {confirmation: (fingerprint, resultado)}, retomada).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT run_id FROM runs WHERE run_key = ? AND finished_at IS NULL ORDER BY started_at DESC LIMIT 1",
+                                     (run_key,)).fetchone() if resume else None
+            if row is None:
+                run_id = uuid.uuid4().hex
+                # Execuções interrompidas com a mesma chave são encerradas como abandonadas: uma retomada futura não volta a elas
+                self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_key = ? AND finished_at IS NULL", (time.time(), run_key))
+                self._conn.execute("INSERT INTO runs (run_id, run_key, started_at) VALUES (?, ?, ?)", (run_id, run_key, time.time()))
+                self._conn.commit()
+                return run_id, {}, False
+            run_id = row[0]
+            rows = self._conn.execute("SELECT confirmation, fingerprint, result FROM run_rows WHERE run_id = ?", (run_id,)).fetchall()
+        return run_id, {conf: (fp, json.loads(result)) for conf, fp, result in rows}, True
+
+    def record(self, run_id, confirmation, row_index, fingerprint, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO run_rows (run_id, confirmation, row_index, fingerprint, result, decided_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, confirmation, row_index, fingerprint, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
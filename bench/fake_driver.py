@@ -0,0 +1,127 @@
+# Driver falso do Selenium para rodar o verificador sem navegador e sem rede.
+# Simula o webmail que fetch_email_text percorre (barra de busca, resultado, corpo, botão fechar),
+# com latência configurável por etapa, e responde às requisições de mail_api (busca pela rede).
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+
+# Segundos até cada parte da página aparecer; 'render' = tempo com o corpo ainda pela metade
+DEFAULT_LATENCY = {'busca': 0.02, 'resultado': 0.05, 'corpo': 0.05, 'render': 0.05, 'rede': 0.05}
+BODY_LOCATORS = {(By.ID, 'Pular para mensagem-region'), (By.CSS_SELECTOR, 'div[role="main"]')}
+RESULT_XPATH = re.compile(r'contains\(@aria-label, "(.*)"\)')
+
+
+class FakeElement:
+    def __init__(self, driver, kind):
+        self.driver = driver
+        self.kind = kind
+
+    def is_displayed(self): return True
+    def is_enabled(self): return True
+
+    def clear(self):
+        self.driver.typed = ''
+
+    def send_keys(self, value):
+        if value == Keys.ENTER: self.driver.submit_search()
+        elif value in (Keys.DELETE, Keys.CONTROL + 'a'): self.driver.typed = ''
+        else: self.driver.typed += value
+
+    def click(self):
+        if self.kind == 'resultado': self.driver.open_message()
+        elif self.kind == 'fechar': self.driver.close_message()
+
+    @property
+    def text(self):
+        body = self.driver.corpus.get(self.driver.opened, '')
+        # Corpo renderizando: primeiro só metade do texto
+        return body if time.perf_counter() >= self.driver.rendered_at else body[:len(body) // 2]
+
+
+class FakeDriver:
+    """
+    corpus: {External Reference: texto do e-mail}. latency: segundos por etapa (ver DEFAULT_LATENCY),
+    com variação aleatória de ±jitter. Referências fora do corpus não aparecem na busca.
+    """
+    current_url = 'https://webmail.exemplo/mail/'
+
+    def __init__(self, corpus, latency=None, jitter=0.2, seed=None):
+        self.corpus = corpus
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.typed = ''
+        self.searched, self.search_at = None, 0.0
+        self.opened, self.opened_at, self.rendered_at = None, 0.0, 0.0
+        self.ready_at = 0.0
+        self.requests = 0
+
+    def _delay(self, stage):
+        with self._lock:
+            return self.latency[stage] * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    # --- Página ---
+    def submit_search(self):
+        self.searched, self.search_at = self.typed, time.perf_counter() + self._delay('resultado')
+
+    def open_message(self):
+        now = time.perf_counter()
+        self.opened = self.searched
+        self.opened_at = now + self._delay('corpo')
+        self.rendered_at = self.opened_at + self._delay('render')
+
+    def close_message(self):
+        self.opened = None
+        self.ready_at = time.perf_counter() + self._delay('busca')
+
+    def find_elements(self, by, value):
+        now = time.perf_counter()
+        if (by, value) == (By.ID, 'topSearchInput'):
+            return [FakeElement(self, 'busca')] if now >= self.ready_at else []
+        if by == By.XPATH:
+            match = RESULT_XPATH.search(value)
+            ref = match.group(1) if match else None
+            found = ref is not None and ref == self.searched and ref in self.corpus and now >= self.search_at
+            return [FakeElement(self, 'resultado')] if found else []
+        if (by, value) in BODY_LOCATORS:
+            return [FakeElement(self, 'corpo')] if self.opened and now >= self.opened_at else []
+        if (by, value) == (By.CSS_SELECTOR, 'button[title="Fechar"]'):
+            return [FakeElement(self, 'fechar')]
+        return []
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found: raise NoSuchElementException(value)
+        return found[0]
+
+    def close(self):
+        pass
+
+    # --- Requisições da página (mail_api.BrowserTransport) ---
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, urls):
+        # Um lote de fetch() em paralelo na página: custa uma latência de rede, não uma por URL
+        time.sleep(self._delay('rede'))
+        self.requests += len(urls)
+        return [self._api_response(url) for url in urls]
+
+    def _api_response(self, url):
+        parsed = urllib.parse.urlparse(url)
+        query = urllib.parse.parse_qs(parsed.query)
+        if '$search' in query:
+            ref = query['$search'][0].strip('"')
+            items = [{'Id': ref, 'Subject': f"Reservation confirmation {ref}", 'BodyPreview': ''}] if ref in self.corpus else []
+            return {'ok': True, 'data': {'value': items}}
+        message_id = urllib.parse.unquote(parsed.path.rsplit('/', 1)[-1])
+        if message_id in self.corpus:
+            return {'ok': True, 'data': {'Body': {'ContentType': 'Text', 'Content': self.corpus[message_id]}}}
+        return {'ok': False, 'error': 'HTTP 404'}
@@ -0,0 +1,53 @@
+# Servidor local que imita a API JSON de exemplo da busca pela rede (mail_api.EXAMPLE_ENDPOINTS),
+# para exercitar HttpTransport sem rede: rota de busca e rota de mensagem, servidas a partir do corpus.
+# Referências em 'gone' aparecem na busca mas a mensagem responde 404; as em 'empty' vêm com o corpo vazio.
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MESSAGES_PATH = '/mail/api/messages'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency: time.sleep(server.latency)
+        with server.lock: server.requests += 1
+        if server.session and f"session={server.session}" not in self.headers.get('Cookie', ''):
+            return self._reply(401, {'error': 'sessão inválida'})
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path == MESSAGES_PATH and '$search' in query:
+            ref = query['$search'][0].strip('"')
+            items = [{'Id': f"msg-{ref}", 'Subject': f"Reservation confirmation {ref}", 'BodyPreview': ''}] if ref in server.corpus else []
+            return self._reply(200, {'value': items})
+        if url.path.startswith(MESSAGES_PATH + '/'):
+            ref = urllib.parse.unquote(url.path.rsplit('/', 1)[-1]).removeprefix('msg-')
+            if ref in server.corpus and ref not in server.gone:
+                content = '' if ref in server.empty else server.corpus[ref]
+                return self._reply(200, {'Body': {'ContentType': 'Text', 'Content': content}})
+        self._reply(404, {'error': 'não encontrado'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mail_server(corpus, gone=(), empty=(), session=None, latency=0.0, host='127.0.0.1', port=0):
+    """Sobe o servidor em segundo plano (port=0 escolhe uma porta livre); server.requests conta as requisições."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.corpus, server.gone, server.empty = corpus, set(gone), set(empty)
+    server.session, server.latency = session, latency
+    server.lock, server.requests = threading.Lock(), 0
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.2}, daemon=True).start()
+    return server
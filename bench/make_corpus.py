@@ -0,0 +1,109 @@
+# Gera bench/corpus.jsonl: um e-mail de confirmação anonimizado por External Reference dos CSVs de exemplo.
+# Os textos seguem os formatos reais que o verificador lê (sem nomes, telefones ou dados de pagamento):
+#   per_night     -> "Daily rate : R$349.00 BRL per night" (Padrão Accor)
+#   rate_changes  -> tabela "from <data> to <data> : R$... BRL" (Tarifa do Período)
+#   free_text     -> "BRL 349.00 each night" (regra generico.texto)
+#   ai_only       -> tarifa em texto livre sem moeda antes do valor, que só a IA de backup encontra
+# 'expected' traz a tarifa correta de cada noite da estadia (DD/MM/AAAA).
+# Uso: python bench/make_corpus.py   (determinístico; rode de novo só ao mudar os CSVs ou os formatos)
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from ratecheck import load_reservations, prepare_reservations, stay_nights  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FIXTURES = [os.path.join(ROOT, "PAGINA1.csv"), os.path.join(ROOT, "PAGINA2.csv")]
+CORPUS_PATH = os.path.join(BENCH_DIR, "corpus.jsonl")
+MISMATCH_RATIO = 0.15      # e-mails cuja tarifa difere do CSV (ERRO DE TARIFA esperado)
+FREE_TEXT_RATIO = 0.10
+AI_ONLY_RATIO = 0.10
+
+HEADER = """Reservation confirmation
+Your booking reference: {ref}
+Hotel Exemplo Aeroporto
+Guest: Hóspede {n}
+Arrival: {arrival}
+Departure: {departure}
+Room type: {room_type}
+Rate: {rate_code}
+"""
+FOOTER = """Taxes and fees included.
+Cancellation policy: free cancellation until 18:00 local time on the arrival date.
+Check-in from 14:00. Check-out until 12:00.
+"""
+
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTHS = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December")
+
+
+def long_date(dt):
+    # Nomes em inglês fixos (strftime depende do locale da máquina)
+    return f"{WEEKDAYS[dt.weekday()]}, {MONTHS[dt.month - 1]} {dt.day} {dt.year}"
+
+
+def money(value):
+    return f"R${value:,.2f}"
+
+
+def build_case(rng, n, rec, kind, mismatch):
+    nights = [datetime.strptime(d, "%d/%m/%Y") for d in stay_nights(rec)]
+    base = rec['_rate'] if rec['_rate'] > 0 else 100.0
+    if mismatch:
+        base = round(base + rng.choice((-1, 1)) * rng.uniform(15, 60), 2)
+    expected = {}
+    text = HEADER.format(ref=rec['External Reference'], n=n, arrival=long_date(nights[0]),
+                         departure=long_date(nights[-1] + timedelta(days=1)), room_type=rec.get('Room Type', ''),
+                         rate_code=rec.get('Rate Code', ''))
+
+    if kind == 'rate_changes' and len(nights) > 1:
+        # Até 3 períodos; a noite auditada (05/12) fica com a tarifa do CSV
+        cuts = sorted(rng.sample(range(1, len(nights)), min(2, len(nights) - 1)))
+        bounds = [0] + cuts + [len(nights)]
+        text += "\nRate Changes\n"
+        for lo, hi in zip(bounds, bounds[1:]):
+            span = nights[lo:hi]
+            rate = base if any(d.strftime("%d/%m") == "05/12" for d in span) else round(base * rng.uniform(0.85, 1.15), 2)
+            text += f"from {long_date(span[0])} to {long_date(span[-1] + timedelta(days=1))} : {money(rate)} BRL\n"
+            expected.update({d.strftime("%d/%m/%Y"): rate for d in span})
+        text += f"Total amount : {money(sum(expected.values()))} BRL\n"
+    elif kind == 'free_text':
+        text += f"\nThe room costs BRL {base:.2f} each night of your stay, breakfast included.\n"
+        expected = {d.strftime("%d/%m/%Y"): base for d in nights}
+    elif kind == 'ai_only':
+        text += f"\nThe agreed amount is {base:.2f} reais for each of the nights of your stay, breakfast included.\n"
+        expected = {d.strftime("%d/%m/%Y"): base for d in nights}
+    else:
+        kind = 'per_night'
+        text += f"\nDaily rate : {money(base)} BRL per night\nTotal amount : {money(base * len(nights))} BRL\n"
+        expected = {d.strftime("%d/%m/%Y"): base for d in nights}
+    return {'id': f"{kind}-{n:03d}", 'kind': kind, 'ref': rec['External Reference'], 'text': text + FOOTER, 'expected': expected}
+
+
+def main():
+    rng = random.Random(42)
+    df = prepare_reservations(load_reservations(CSV_FIXTURES, print), set())
+    cases, seen = [], set()
+    for rec in df[df['_status'] == ''].to_dict('records'):
+        if rec['External Reference'] in seen: continue
+        seen.add(rec['External Reference'])
+        draw = rng.random()
+        if draw < AI_ONLY_RATIO: kind = 'ai_only'
+        elif draw < AI_ONLY_RATIO + FREE_TEXT_RATIO: kind = 'free_text'
+        elif rec['Rate'].startswith('Rate Changes'): kind = 'rate_changes'
+        else: kind = 'per_night'
+        cases.append(build_case(rng, len(cases) + 1, rec, kind, rng.random() < MISMATCH_RATIO))
+    with open(CORPUS_PATH, 'w', encoding='utf-8') as f:
+        for case in cases:
+            f.write(json.dumps(case, ensure_ascii=False) + '\n')
+    kinds = {k: sum(c['kind'] == k for c in cases) for k in ('per_night', 'rate_changes', 'free_text', 'ai_only')}
+    print(f"{len(cases)} e-mail(s) em {CORPUS_PATH}: {kinds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# Benchmark e regressão offline: mede a extração de tarifas sobre o corpus de e-mails, o clean_money
+# e a execução completa (process_reservations) com os CSVs de exemplo e o driver falso, sem navegador nem rede.
+# Sai com código 1 se a acurácia cair ou o desempenho piorar além da tolerância em relação a bench/baseline.json.
+# Ex: python bench/run_bench.py --workers 4
+#     python bench/run_bench.py --update-baseline      (depois de uma melhoria confirmada)
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import pandas as pd  # noqa: E402
+import ratecheck  # noqa: E402
+import mail_api  # noqa: E402
+from ratecheck import (process_reservations, find_rates_hybrid, parse_rate_index, clean_money, clean_money_series,  # noqa: E402
+                       stay_nights, ai_reader, AI_MODES)
+from profiler import percentile  # noqa: E402
+from fake_driver import FakeDriver, DEFAULT_LATENCY  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FIXTURES = [os.path.join(ROOT, "PAGINA1.csv"), os.path.join(ROOT, "PAGINA2.csv")]
+CORPUS_PATH = os.path.join(BENCH_DIR, "corpus.jsonl")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+TARGET_DATE = "05/12/2025"
+PRECLASSIFIED = ('IGNORADO (SHARE)', 'SEM REF.', 'IGNORADO (QUARTO)')
+# Referência medida na mesma execução, intercalada com cada medida: os tempos comparados com a baseline são
+# relativos a ela, então não dependem da máquina nem da carga do momento
+REFERENCE_PATTERN = re.compile(r"[^\d.,]")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def same_rate(a, b):
+    return abs(a - b) < 0.01
+
+
+def reference_pass(texts):
+    for text in texts: REFERENCE_PATTERN.sub('', text)
+
+
+def bench_extraction(corpus, repeat, use_ai):
+    """
+    Acurácia por tipo de e-mail (todas as noites da estadia) e tempo de leitura por e-mail, com o cache frio.
+    A regressão compara o p50 relativo à referência (uma limpeza por regex do mesmo texto).
+    """
+    hits, totals, times, reference = {}, {}, [], []
+    for case in corpus:
+        if case['kind'] == 'ai_only' and not use_ai: continue
+        nights = list(case['expected'])
+        for _ in range(repeat):
+            parse_rate_index.cache_clear()
+            started = time.perf_counter()
+            found = find_rates_hybrid(case['text'], nights)
+            times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            reference_pass([case['text']])
+            reference.append(time.perf_counter() - started)
+        ok = sum(same_rate(rate, case['expected'][night]) for night, (rate, *_) in zip(nights, found))
+        hits[case['kind']] = hits.get(case['kind'], 0) + ok
+        totals[case['kind']] = totals.get(case['kind'], 0) + len(nights)
+    times.sort(); reference.sort()
+    return {'acuracia': {kind: hits[kind] / totals[kind] for kind in sorted(totals)},
+            'noites': totals, 'p50_ms': percentile(times, 50) * 1000, 'p95_ms': percentile(times, 95) * 1000,
+            'p50_relativo': percentile(times, 50) / percentile(reference, 50)}
+
+
+def bench_clean_money(repeat):
+    values = pd.concat([pd.read_csv(p, dtype=str).fillna('')['Rate'] for p in CSV_FIXTURES], ignore_index=True)
+    expected = [clean_money(v) for v in values]
+    parity = list(clean_money_series(values)) == expected
+    # Melhor de 'repeat' rodadas: menos sensível a outros processos da máquina que a média
+    scalar = vector = reference = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for v in values: clean_money(v)
+        scalar = min(scalar, (time.perf_counter() - started) / len(values))
+        started = time.perf_counter()
+        clean_money_series(values)
+        vector = min(vector, (time.perf_counter() - started) / len(values))
+        started = time.perf_counter()
+        reference_pass(values)
+        reference = min(reference, (time.perf_counter() - started) / len(values))
+    return {'paridade_serie': parity, 'us_por_valor': scalar * 1e6, 'us_por_valor_serie': vector * 1e6,
+            'relativo': scalar / reference, 'relativo_serie': vector / reference}
+
+
+def expected_status(case, csv_rate, nights):
+    rates = [case['expected'].get(n, 0.0) for n in nights]
+    return 'CORRETO' if rates and all(r > 0 and abs(csv_rate - r) < 1.00 for r in rates) else 'ERRO DE TARIFA'
+
+
+def bench_end_to_end(corpus, args, use_ai):
+    """Execução completa com o driver falso: linhas por segundo e status corretos contra o esperado do corpus."""
+    by_ref = {case['ref']: case for case in corpus}
+    texts = {ref: case['text'] for ref, case in by_ref.items()}
+    latency = {**DEFAULT_LATENCY, **args.latency}
+    drivers = []
+    def driver_factory(address, new_tab):
+        drivers.append(FakeDriver(texts, latency, seed=len(drivers)))
+        return drivers[-1]
+    outcome, logs = {}, []
+    log = print if args.verbose else logs.append
+
+    # O driver falso responde ao contrato de exemplo; o MAIL_API real vem sem endpoints
+    if args.fetch == 'rede': mail_api.MAIL_API.update(mail_api.EXAMPLE_ENDPOINTS)
+    started = time.perf_counter()
+    process_reservations(CSV_FIXTURES, TARGET_DATE, set(), log, lambda value, text: None,
+                         lambda results, *_: outcome.update(results=results), threading.Event(),
+                         workers=args.workers, per_stay=args.per_stay, ai_mode=args.ai, fetch_backend=args.fetch,
+                         driver_factory=driver_factory)
+    elapsed = time.perf_counter() - started
+    profile = ratecheck.profiler.summary()
+
+    records = {(rec['Room'], rec['External Reference']): rec for rec in ratecheck.prepare_reservations(
+        ratecheck.load_reservations(CSV_FIXTURES, logs.append), set()).to_dict('records')}
+    checked = correct = 0
+    for result in outcome.get('results', []):
+        case = by_ref.get(result['Ref.'])
+        if case is None or result['Status'] in PRECLASSIFIED: continue
+        if case['kind'] == 'ai_only' and not use_ai: continue
+        rec = records[(result['Quarto'], result['Ref.'])]
+        nights = stay_nights(rec) if args.per_stay else [TARGET_DATE]
+        checked += 1
+        correct += result['Status'] == expected_status(case, rec['_rate'], nights)
+    return {'linhas': profile['linhas'], 'duracao_s': elapsed, 'linhas_por_segundo': profile['linhas'] / elapsed if elapsed else 0.0,
+            'acuracia': correct / checked if checked else 0.0, 'conferidas': checked,
+            'etapas_p95_ms': {name: s['p95'] * 1000 for name, s in profile['etapas'].items()}}
+
+
+def baseline_view(results):
+    """O que vai para baseline.json: acurácias e tempos relativos à referência, sem tempos absolutos desta máquina."""
+    ext, cm = results['extracao'], results['clean_money']
+    view = {'config': results['config'],
+            'extracao': {'acuracia': ext['acuracia'], 'noites': ext['noites'], 'p50_relativo': ext['p50_relativo']},
+            'clean_money': {'paridade_serie': cm['paridade_serie'], 'relativo': cm['relativo'], 'relativo_serie': cm['relativo_serie']}}
+    if 'ponta_a_ponta' in results:
+        # A vazão da execução completa vem das latências do driver falso (configuração), não da CPU
+        e2e = results['ponta_a_ponta']
+        view['ponta_a_ponta'] = {'acuracia': e2e['acuracia'], 'conferidas': e2e['conferidas'], 'linhas_por_segundo': e2e['linhas_por_segundo']}
+    return view
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regressões: acurácia menor que a da baseline, ou tempos relativos piores que (1 + tolerância) x baseline."""
+    problems = []
+    base, cur = baseline.get('extracao', {}), results['extracao']
+    for kind, value in base.get('acuracia', {}).items():
+        if kind in cur['acuracia'] and cur['acuracia'][kind] < value - 1e-9:
+            problems.append(f"acurácia da extração ({kind}) caiu: {value:.3f} -> {cur['acuracia'][kind]:.3f}")
+    if 'p50_relativo' in base and cur['p50_relativo'] > base['p50_relativo'] * (1 + tolerance):
+        problems.append(f"leitura por e-mail mais lenta: p50 {base['p50_relativo']:.2f}x -> {cur['p50_relativo']:.2f}x a referência")
+    base, cur = baseline.get('clean_money', {}), results['clean_money']
+    if not cur['paridade_serie']:
+        problems.append("clean_money_series diverge de clean_money")
+    if 'relativo' in base and cur['relativo'] > base['relativo'] * (1 + tolerance):
+        problems.append(f"clean_money mais lento: {base['relativo']:.2f}x -> {cur['relativo']:.2f}x a referência")
+    base, cur = baseline.get('ponta_a_ponta', {}), results.get('ponta_a_ponta')
+    if cur and base:
+        if cur['acuracia'] < base.get('acuracia', 0) - 1e-9:
+            problems.append(f"acurácia ponta a ponta caiu: {base['acuracia']:.3f} -> {cur['acuracia']:.3f}")
+        # Vazão só é comparável com a mesma configuração (workers, latências, backend...)
+        if baseline.get('config') == results['config'] and cur['linhas_por_segundo'] < base['linhas_por_segundo'] / (1 + tolerance):
+            problems.append(f"vazão caiu: {base['linhas_por_segundo']:.2f} -> {cur['linhas_por_segundo']:.2f} linhas/s")
+    return problems
+
+
+def parse_latency(value):
+    latency = {}
+    for item in filter(None, value.split(',')):
+        stage, _, seconds = item.partition('=')
+        if stage not in DEFAULT_LATENCY: raise argparse.ArgumentTypeError(f"etapa desconhecida: {stage}")
+        latency[stage] = float(seconds)
+    return latency
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark offline do Verificador de Tarifas")
+    parser.add_argument('--workers', type=int, default=4, help="Navegadores falsos em paralelo")
+    parser.add_argument('--latency', type=parse_latency, default={}, help="Latência por etapa, ex: resultado=0.2,corpo=0.1 (etapas: " + ", ".join(DEFAULT_LATENCY) + ")")
+    parser.add_argument('--fetch', choices=('dom', 'rede'), default='dom')
+    parser.add_argument('--per-stay', action='store_true')
+    parser.add_argument('--ai', choices=sorted(set(AI_MODES.values())), default='off', help="Com a IA ligada, os e-mails ai_only também são medidos")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetições das medições de leitura")
+    parser.add_argument('--skip-e2e', action='store_true', help="Mede só extração e clean_money")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Piora de tempo aceita (0.5 = 50%%) antes de falhar")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="Grava os resultados desta execução como nova baseline")
+    parser.add_argument('--json', help="Grava os resultados (JSON) neste arquivo")
+    parser.add_argument('--verbose', action='store_true', help="Mostra o log do processamento")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    corpus = load_corpus()
+    ai_reader.configure(args.ai)
+    use_ai = args.ai != 'off' and ai_reader.is_available()
+
+    results = {'config': {'workers': args.workers, 'latency': {**DEFAULT_LATENCY, **args.latency}, 'fetch': args.fetch,
+                          'per_stay': args.per_stay, 'ia': use_ai}}
+    results['extracao'] = bench_extraction(corpus, args.repeat, use_ai)
+    results['clean_money'] = bench_clean_money(args.repeat)
+    if not args.skip_e2e:
+        results['ponta_a_ponta'] = bench_end_to_end(corpus, args, use_ai)
+
+    ext = results['extracao']
+    print(f"Extração: {sum(ext['noites'].values())} noite(s) em {len(corpus)} e-mail(s)" + ("" if use_ai else " (ai_only ignorados: IA desligada/indisponível)"))
+    for kind, value in ext['acuracia'].items():
+        print(f"  {kind:<14} acurácia {value:6.1%}  ({ext['noites'][kind]} noites)")
+    print(f"  leitura por e-mail: p50 {ext['p50_ms']:.3f}ms ({ext['p50_relativo']:.2f}x a referência)  p95 {ext['p95_ms']:.3f}ms")
+    cm = results['clean_money']
+    print(f"clean_money: {cm['us_por_valor']:.2f}us/valor = {cm['relativo']:.2f}x a referência "
+          f"(série {cm['us_por_valor_serie']:.2f}us/valor = {cm['relativo_serie']:.2f}x, paridade {'ok' if cm['paridade_serie'] else 'FALHOU'})")
+    if 'ponta_a_ponta' in results:
+        e2e = results['ponta_a_ponta']
+        print(f"Ponta a ponta: {e2e['linhas']} reserva(s) em {e2e['duracao_s']:.2f}s = {e2e['linhas_por_segundo']:.2f} linhas/s "
+              f"| acurácia {e2e['acuracia']:.1%} ({e2e['conferidas']} conferidas) | {args.workers} worker(s), busca '{args.fetch}'")
+        print("  p95 por etapa: " + ", ".join(f"{k} {v:.0f}ms" for k, v in sorted(e2e['etapas_p95_ms'].items())))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f: json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f: json.dump(baseline_view(results), f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravada em {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("Sem baseline para comparar (use --update-baseline).")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        problems = compare(results, json.load(f), args.tolerance)
+    for problem in problems: print(f"REGRESSÃO: {problem}")
+    if not problems: print("Sem regressões em relação à baseline.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
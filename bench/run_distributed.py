@@ -0,0 +1,109 @@
+# Execução distribuída offline: sobe o coordenador (coordinator.py) com os CSVs de exemplo e vários
+# agentes em processos separados, cada um com o driver falso e o corpus do bench, sem navegador nem rede.
+# Com --kill-after, um agente é derrubado no meio da execução para conferir a reatribuição dos leases.
+# Sai com código 1 se faltar alguma reserva no relatório ou algum status divergir do esperado pelo corpus.
+# Ex: python bench/run_distributed.py --agents 3 --kill-after 10
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import coordinator  # noqa: E402
+from coordinator import AuditCoordinator, start_server, run_agent  # noqa: E402
+from ratecheck import load_reservations, stay_nights  # noqa: E402
+from fake_driver import FakeDriver, DEFAULT_LATENCY  # noqa: E402
+from run_bench import load_corpus, expected_status, parse_latency, CSV_FIXTURES, TARGET_DATE, PRECLASSIFIED  # noqa: E402
+
+
+def agent_main(args):
+    """Processo agente: confere leases com um driver falso por navegador."""
+    corpus = {case['ref']: case['text'] for case in load_corpus()}
+    latency = {**DEFAULT_LATENCY, **args.latency}
+    seeds = iter(range(10 ** 6))
+    driver_factory = lambda address, new_tab: FakeDriver(corpus, latency, seed=next(seeds))
+    log = (lambda msg: print(f"[{args.agent}] {msg}", file=sys.stderr, flush=True)) if args.verbose else (lambda msg: None)
+    run_agent(args.url, log, threading.Event(), args.agent, driver_factory=driver_factory, workers=args.workers, ai_mode='off')
+    return 0
+
+
+def spawn_agent(url, name, args):
+    command = [sys.executable, os.path.abspath(__file__), '--agent', name, '--url', url, '--workers', str(args.workers),
+               '--latency', ",".join(f"{k}={v}" for k, v in args.latency.items())] + (['--verbose'] if args.verbose else [])
+    return subprocess.Popen(command)
+
+
+def check_results(coord, per_stay):
+    """(conferidas, erradas, faltando) contra o esperado do corpus."""
+    by_ref = {case['ref']: case for case in load_corpus()}
+    checked, wrong = 0, []
+    for rec, result in zip(coord.records, coord.slots):
+        if result is None or result['Status'] in PRECLASSIFIED: continue
+        case = by_ref.get(rec['External Reference'])
+        # Os agentes rodam sem IA: os casos ai_only não têm como sair certos
+        if case is None or case['kind'] == 'ai_only': continue
+        checked += 1
+        if result['Status'] != expected_status(case, rec['_rate'], stay_nights(rec) if per_stay else [TARGET_DATE]):
+            wrong.append(f"{rec['Room']} ({rec['External Reference']}): {result['Status']}")
+    return checked, wrong, sum(slot is None for slot in coord.slots)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Execução distribuída offline (coordenador + agentes com driver falso)")
+    parser.add_argument('--agents', type=int, default=3, help="Processos agentes")
+    parser.add_argument('--workers', type=int, default=2, help="Navegadores falsos por agente")
+    parser.add_argument('--lease-size', type=int, default=10)
+    parser.add_argument('--lease-timeout', type=float, default=3.0, help="Curto, para a reatribuição aparecer rápido")
+    parser.add_argument('--kill-after', type=int, default=0, help="Derruba o primeiro agente depois de N reservas decididas (0 = não derruba)")
+    parser.add_argument('--per-stay', action='store_true')
+    parser.add_argument('--latency', type=parse_latency, default={}, help="Latência por etapa do driver falso (ver run_bench.py)")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Tempo máximo da execução")
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--agent', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.agent: return agent_main(args)
+
+    log = print if args.verbose else (lambda msg: None)
+    # Agentes que pedem lease enquanto os outros terminam não precisam esperar 2s
+    coordinator.AGENT_POLL = 0.2
+    coord = AuditCoordinator(load_reservations(CSV_FIXTURES, log), TARGET_DATE, args.per_stay, lease_size=args.lease_size,
+                             lease_timeout=args.lease_timeout, update_log_callback=log)
+    server = start_server(coord, port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    started = time.perf_counter()
+    agents = [spawn_agent(url, f"agente{i + 1}", args) for i in range(args.agents)]
+    killed = None
+    try:
+        while not coord.finished.wait(0.1):
+            if time.perf_counter() - started > args.timeout: break
+            if args.kill_after and killed is None and sum(coord.status()['por_agente'].values()) >= args.kill_after:
+                killed = agents[0]
+                killed.kill()
+                print(f"agente1 derrubado depois de {coord.status()['por_agente'].get('agente1', 0)} reserva(s)")
+        elapsed = time.perf_counter() - started
+        for proc in agents:
+            try: proc.wait(timeout=10)
+            except subprocess.TimeoutExpired: proc.kill()
+    finally:
+        server.shutdown()
+
+    status = coord.status()
+    checked, wrong, missing = check_results(coord, args.per_stay)
+    print(f"{coord.total_to_fetch} reserva(s) em {elapsed:.2f}s = {coord.total_to_fetch / elapsed:.2f} linhas/s | "
+          f"{args.agents} agente(s) x {args.workers} navegador(es) | reatribuições: {status['reatribuicoes']}")
+    print("  por agente: " + json.dumps(status['por_agente'], ensure_ascii=False))
+    print(f"  conferidas: {checked} | divergentes do esperado: {len(wrong)} | faltando: {missing}")
+    for line in wrong: print(f"  DIVERGENTE: {line}")
+    if args.kill_after and not status['reatribuicoes']:
+        print("  (o agente derrubado não tinha lease ativo: nada a reatribuir)")
+    return 1 if wrong or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Conferência offline da busca pela rede por HTTP: sobe o servidor local (fake_mail_server.py) com o corpus
+# e roda MailApiBackend.fetch_many através de HttpTransport, incluindo referências fora da busca, mensagens
+# que respondem 404 e corpos vazios. Depois confere que essas falhas seguem pela interface (EmailSource + driver falso).
+# Sai com código 1 se algum e-mail vier diferente do corpus ou alguma falha não cair na interface.
+# Ex: python bench/run_mail_api.py
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from mail_api import MailApiBackend, MailApiError, HttpTransport, EXAMPLE_ENDPOINTS  # noqa: E402
+from ratecheck import EmailSource  # noqa: E402
+from fake_driver import FakeDriver  # noqa: E402
+from fake_mail_server import start_mail_server  # noqa: E402
+from run_bench import load_corpus  # noqa: E402
+
+SESSION = 'bench'
+MISSING_REF = 'NAO-EXISTE-000'
+
+
+def check_fetch_many(corpus, url, gone, empty):
+    """fetch_many direto pelo HttpTransport: texto igual ao corpus, e MailApiError para as falhas."""
+    problems = []
+    transport = HttpTransport(url, cookies=[{'name': 'session', 'value': SESSION}])
+    refs = list(corpus) + [MISSING_REF]
+    started = time.perf_counter()
+    found = MailApiBackend(EXAMPLE_ENDPOINTS).fetch_many(transport, refs)
+    elapsed = time.perf_counter() - started
+    for ref in refs:
+        text = found.get(ref)
+        should_fail = ref in gone or ref in empty or ref == MISSING_REF
+        if should_fail != isinstance(text, MailApiError):
+            problems.append(f"{ref}: esperado {'falha' if should_fail else 'texto'}, veio {text!r:.60}")
+        elif not should_fail and text != corpus[ref].strip():
+            problems.append(f"{ref}: texto diferente do corpus")
+    print(f"fetch_many por HTTP: {len(refs)} referência(s) em {elapsed * 1000:.0f}ms | "
+          f"falhas: {sum(isinstance(t, MailApiError) for t in found.values())} (esperadas: {len(gone) + len(empty) + 1})")
+
+    unauthorized = MailApiBackend(EXAMPLE_ENDPOINTS).fetch_many(HttpTransport(url), refs[:1])
+    if not isinstance(unauthorized[refs[0]], MailApiError):
+        problems.append("sem o cookie da sessão a busca deveria falhar")
+    return problems
+
+
+def check_fallback(corpus, url, gone, empty):
+    """EmailSource.prefetch pelo HttpTransport; as referências que falharam são buscadas pela interface (driver falso)."""
+    problems = []
+    source = EmailSource(network=MailApiBackend(EXAMPLE_ENDPOINTS), transport_factory=lambda driver: HttpTransport(url, cookies=[{'name': 'session', 'value': SESSION}]))
+    driver = FakeDriver(corpus, {stage: 0.0 for stage in ('busca', 'resultado', 'corpo', 'render')}, seed=0)
+    fetched = source.prefetch(driver, list(corpus), lambda msg: None)
+    if fetched != len(corpus) - len(gone) - len(empty):
+        problems.append(f"prefetch obteve {fetched} e-mail(s), esperado {len(corpus) - len(gone) - len(empty)}")
+    for ref in sorted(set(gone) | set(empty)):
+        try:
+            text, _ = source.get(driver, ref, lambda msg: None)
+        except Exception as e:
+            problems.append(f"{ref}: a interface também falhou ({e})")
+            continue
+        if text != corpus[ref]:
+            problems.append(f"{ref}: texto da interface diferente do corpus")
+    print(f"Alternativa pela interface: {len(gone)} com 404 e {len(empty)} com corpo vazio buscados pelo driver falso")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca pela rede por HTTP contra um servidor local")
+    parser.add_argument('--latency', type=float, default=0.02, help="Segundos por requisição no servidor")
+    args = parser.parse_args(argv)
+
+    corpus = {case['ref']: case['text'] for case in load_corpus()}
+    refs = sorted(corpus)
+    gone, empty = refs[:3], refs[3:6]
+    server = start_mail_server(corpus, gone, empty, session=SESSION, latency=args.latency)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        problems = check_fetch_many(corpus, url, gone, empty) + check_fallback(corpus, url, gone, empty)
+    finally:
+        server.shutdown()
+    for line in problems: print(f"  FALHOU: {line}")
+    print(f"{server.requests} requisição(ões) ao servidor local | " + ("tudo certo" if not problems else f"{len(problems)} problema(s)"))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+# Conferência distribuída: um coordenador divide as reservas dos CSVs em lotes (leases) e os entrega,
+# por HTTP na rede local, a agentes em outras máquinas (cada uma com o seu Chrome autenticado).
+# Cada agente confere o lote com process_reservations e devolve os resultados aos poucos; o coordenador
+# junta tudo num relatório só. Lease sem notícias do agente por LEASE_TIMEOUT volta para a fila.
+# Ex: python coordinator.py serve --csv PAGINA1.csv PAGINA2.csv --date 05/12/2025 --out resultado.csv --host 0.0.0.0 --token segredo
+#     python coordinator.py agent --url http://192.168.0.10:8765 --token segredo --property H5021
+import argparse
+import io
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter, deque
+from datetime import datetime, date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ratecheck
+from ratecheck import (process_reservations, load_reservations, prepare_reservations, parse_audit_dates, make_result,
+                       AI_MODES, FETCH_BACKENDS)
+
+# --- CONFIGURAÇÕES ---
+DEFAULT_PORT = 8765
+LEASE_SIZE = 20            # reservas por lease
+LEASE_TIMEOUT = 60.0       # segundos sem notícias do agente até o lease voltar para a fila
+LEASE_MAX_ATTEMPTS = 3     # reserva cujo lease expirou tantas vezes vira ERRO GERAL (não trava a execução)
+AGENT_POLL = 2.0           # espera do agente quando não há lease livre (os restantes estão com outros agentes)
+AGENT_MAX_FAILURES = 5     # falhas seguidas de conexão com o coordenador até o agente desistir
+TOKEN_HEADER = 'X-RateCheck-Token'
+
+
+class Lease:
+    def __init__(self, lease_id, property_code, indices):
+        self.lease_id = lease_id
+        self.property_code = property_code
+        self.indices = list(indices)
+        self.agent = None
+        self.deadline = None
+
+
+class AuditCoordinator:
+    """
+    Estado da execução distribuída (sem HTTP): leases pendentes e ativos e o resultado de cada linha.
+    Os leases nunca misturam Property, para o agente de cada hotel pegar só as suas reservas.
+    on_result(index, resultado, agente) recebe cada linha assim que é decidida, inclusive as pré-classificadas.
+    """
+    def __init__(self, df, target_date_str, per_stay=False, ignore_set=(), lease_size=LEASE_SIZE, lease_timeout=LEASE_TIMEOUT,
+                 update_log_callback=print, on_result=None):
+        self.df = df
+        self.target_date_str = target_date_str
+        self.per_stay = per_stay
+        self.lease_timeout = lease_timeout
+        self.log = update_log_callback
+        self.on_result = on_result or (lambda index, result, agent: None)
+        self.records = prepare_reservations(df, set(ignore_set)).to_dict('records')
+        self.slots = [None] * len(self.records)
+        self.finished = threading.Event()
+        self.reassigned = 0
+        self.rows_by_agent = Counter()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._attempts = Counter()
+        self._pending = deque()
+        self._active = {}
+
+        groups = {}
+        for index, rec in enumerate(self.records):
+            if rec['_status']:
+                self._store(index, make_result(rec['Room'], rec['Name'], rec['External Reference'], rec['Rate'], '', rec['_status']), None)
+            else:
+                groups.setdefault(str(rec.get('Property', '')).strip(), []).append(index)
+        for property_code, indices in groups.items():
+            for i in range(0, len(indices), lease_size):
+                self._pending.append(Lease(next(self._ids), property_code, indices[i:i + lease_size]))
+        self.total_to_fetch = sum(len(indices) for indices in groups.values())
+        by_property = ", ".join(f"{p or 'sem Property'}: {len(indices)}" for p, indices in groups.items())
+        self.log(f"Total de reservas: {len(self.records)} | Sem necessidade de busca: {len(self.records) - self.total_to_fetch} | "
+                 f"Para buscar: {self.total_to_fetch} em {len(self._pending)} lease(s)" + (f" ({by_property})" if groups else ""))
+        self._check_finished()
+
+    def _store(self, index, result, agent):
+        # Chamado com o lock (ou no __init__); a primeira resposta vale (um lease expirado pode responder tarde)
+        if self.slots[index] is not None: return False
+        self.slots[index] = result
+        if agent: self.rows_by_agent[agent] += 1
+        self.on_result(index, result, agent)
+        return True
+
+    def _check_finished(self):
+        if all(slot is not None for slot in self.slots) and not self.finished.is_set():
+            self.finished.set()
+
+    def _requeue(self, lease, reason):
+        """Devolve à fila as linhas do lease ainda sem resultado (as que já expiraram demais viram ERRO GERAL)."""
+        left, given_up = [], []
+        for index in lease.indices:
+            if self.slots[index] is not None: continue
+            (given_up if self._attempts[index] >= LEASE_MAX_ATTEMPTS else left).append(index)
+        for index in given_up:
+            rec = self.records[index]
+            self.log(f"Quarto {rec['Room']} (Ref: {rec['External Reference']}): {LEASE_MAX_ATTEMPTS} lease(s) sem resposta, marcado como ERRO GERAL.")
+            self._store(index, make_result(rec['Room'], rec['Name'], rec['External Reference'], rec['Rate'], 'SEM AGENTE', 'ERRO GERAL'), None)
+        if left:
+            self.reassigned += 1
+            # Na frente da fila: são as reservas que estão esperando há mais tempo
+            self._pending.appendleft(Lease(next(self._ids), lease.property_code, left))
+            self.log(f"Lease {lease.lease_id} ({lease.agent}) {reason}: {len(left)} reserva(s) voltam para a fila.")
+        self._check_finished()
+
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for lease in [lease for lease in self._active.values() if lease.deadline < now]:
+                del self._active[lease.lease_id]
+                self._requeue(lease, "expirou")
+
+    def checkout(self, agent, properties=None):
+        """
+        Próximo lease para o agente (só das Property informadas, se houver):
+        {'lease', 'indices', 'csv', 'data_alvo', 'estadia', 'prazo'}, {'aguarde': s} ou {'fim': True}.
+        """
+        self.expire()
+        with self._lock:
+            if self.finished.is_set(): return {'fim': True}
+            for lease in list(self._pending):
+                if properties and lease.property_code not in properties: continue
+                self._pending.remove(lease)
+                lease.indices = [i for i in lease.indices if self.slots[i] is None]
+                if not lease.indices: continue
+                lease.agent, lease.deadline = agent, time.monotonic() + self.lease_timeout
+                for index in lease.indices: self._attempts[index] += 1
+                self._active[lease.lease_id] = lease
+                self.log(f"Lease {lease.lease_id} ({lease.property_code or 'sem Property'}, {len(lease.indices)} reserva(s)) entregue a {agent}.")
+                return {'lease': lease.lease_id, 'indices': lease.indices, 'csv': self.df.iloc[lease.indices].to_csv(index=False),
+                        'data_alvo': self.target_date_str, 'estadia': self.per_stay, 'prazo': self.lease_timeout}
+            return {'aguarde': AGENT_POLL}
+
+    def report(self, agent, lease_id, results, final=False):
+        """
+        Resultados parciais de um lease ([(índice, resultado)]) e renovação do prazo. final=True encerra o lease:
+        o que ficou sem resultado volta para a fila. Devolve {'valido': False} se o lease já expirou.
+        """
+        with self._lock:
+            for index, result in results:
+                if 0 <= index < len(self.slots): self._store(index, result, agent)
+            lease = self._active.get(lease_id)
+            valid = lease is not None and lease.agent == agent
+            if valid and final:
+                del self._active[lease_id]
+                self._requeue(lease, "encerrado incompleto")
+            elif valid:
+                lease.deadline = time.monotonic() + self.lease_timeout
+            self._check_finished()
+        return {'valido': valid}
+
+    def status(self):
+        with self._lock:
+            decided = sum(slot is not None for slot in self.slots)
+            return {'total': len(self.slots), 'decididas': decided, 'leases_pendentes': len(self._pending),
+                    'leases_ativos': {lease_id: lease.agent for lease_id, lease in self._active.items()},
+                    'reatribuicoes': self.reassigned, 'por_agente': dict(self.rows_by_agent), 'fim': self.finished.is_set()}
+
+    def results(self):
+        return [r for r in self.slots if r is not None]
+
+
+# --- PROTOCOLO HTTP ---
+# POST /lease     {'agente', 'properties'}                        -> AuditCoordinator.checkout
+# POST /progresso {'agente', 'lease', 'resultados', 'final'}      -> AuditCoordinator.report
+# GET  /status                                                     -> AuditCoordinator.status
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        token = self.server.token
+        if token and self.headers.get(TOKEN_HEADER) != token:
+            self._reply(403, {'erro': 'token inválido'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized(): return
+        if self.path == '/status': self._reply(200, self.server.coordinator.status())
+        else: self._reply(404, {'erro': 'rota desconhecida'})
+
+    def do_POST(self):
+        if not self._authorized(): return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            agent = str(payload['agente'])
+            coordinator = self.server.coordinator
+            if self.path == '/lease':
+                self._reply(200, coordinator.checkout(agent, set(payload.get('properties') or ())))
+            elif self.path == '/progresso':
+                results = [(int(index), result) for index, result in payload.get('resultados', [])]
+                self._reply(200, coordinator.report(agent, payload['lease'], results, bool(payload.get('final'))))
+            else:
+                self._reply(404, {'erro': 'rota desconhecida'})
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {'erro': f"requisição inválida: {e}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(coordinator, host='127.0.0.1', port=DEFAULT_PORT, token=None):
+    """Sobe o servidor HTTP em segundo plano (port=0 escolhe uma porta livre) e uma thread que expira os leases."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.coordinator, server.token = coordinator, token
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.2}, daemon=True).start()
+
+    def reaper():
+        while not coordinator.finished.wait(1.0): coordinator.expire()
+    threading.Thread(target=reaper, daemon=True).start()
+    return server
+
+
+# --- AGENTE ---
+
+class CoordinatorClient:
+    def __init__(self, url, agent, token=None, timeout=30):
+        self.url = url.rstrip('/')
+        self.agent = agent
+        self.headers = {'Content-Type': 'application/json', **({TOKEN_HEADER: token} if token else {})}
+        self.timeout = timeout
+
+    def post(self, path, payload):
+        data = json.dumps({'agente': self.agent, **payload}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=data, headers=self.headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def default_agent_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_lease(client, lease, update_log_callback, stop_event, **process_kwargs):
+    """
+    Confere um lease com process_reservations e envia os resultados ao coordenador a cada prazo/4
+    (o envio também renova o prazo). Se o coordenador disser que o lease expirou, a conferência é interrompida.
+    """
+    indices = lease['indices']
+    buffer, lock = [], threading.Lock()
+    lease_stop, finished = threading.Event(), threading.Event()
+
+    def on_result(local_index, result):
+        with lock: buffer.append((indices[local_index], result))
+
+    def flush(final=False):
+        with lock: batch, buffer[:] = list(buffer), []
+        try:
+            answer = client.post('/progresso', {'lease': lease['lease'], 'resultados': batch, 'final': final})
+        except Exception as e:
+            with lock: buffer[:0] = batch
+            update_log_callback(f"Falha ao enviar resultados ao coordenador: {e}")
+            return False
+        if not answer.get('valido'):
+            update_log_callback(f"Lease {lease['lease']} expirou no coordenador; interrompendo.")
+            lease_stop.set()
+        return True
+
+    def reporter():
+        while not finished.wait(max(0.5, lease['prazo'] / 4)):
+            if stop_event.is_set(): lease_stop.set()
+            flush()
+    thread = threading.Thread(target=reporter, daemon=True)
+    thread.start()
+    try:
+        process_reservations([io.StringIO(lease['csv'])], lease['data_alvo'], set(), update_log_callback, lambda value, text: None,
+                             lambda *_: None, lease_stop, per_stay=lease['estadia'], on_result_callback=on_result, **process_kwargs)
+    finally:
+        finished.set()
+        thread.join()
+        for _ in range(AGENT_MAX_FAILURES):
+            if flush(final=True): break
+            time.sleep(AGENT_POLL)
+
+
+def run_agent(url, update_log_callback, stop_event, agent=None, properties=(), token=None, driver_factory=None, **process_kwargs):
+    """
+    Pede leases ao coordenador até ele avisar o fim (ou stop_event). process_kwargs vão para process_reservations
+    (workers, debugger_addresses, email_cache, ai_mode, fetch_backend...). Devolve o número de leases conferidos.
+    """
+    client = CoordinatorClient(url, agent or default_agent_name(), token)
+    if driver_factory is None:
+        # Instala o chromedriver uma vez, não a cada lease
+        driver_path = ratecheck.ChromeDriverManager().install()
+        driver_factory = lambda address, new_tab: ratecheck.open_driver(address, driver_path, new_tab)
+    update_log_callback(f"Agente {client.agent} conectando a {client.url}" + (f" (Property: {', '.join(properties)})" if properties else ""))
+    done = failures = 0
+    while not stop_event.is_set():
+        try:
+            lease = client.post('/lease', {'properties': list(properties)})
+            failures = 0
+        except Exception as e:
+            failures += 1
+            update_log_callback(f"Coordenador indisponível ({failures}/{AGENT_MAX_FAILURES}): {e}")
+            if failures >= AGENT_MAX_FAILURES: break
+            stop_event.wait(AGENT_POLL)
+            continue
+        if lease.get('fim'): break
+        if 'aguarde' in lease:
+            stop_event.wait(lease['aguarde'])
+            continue
+        update_log_callback(f"Lease {lease['lease']}: {len(lease['indices'])} reserva(s)")
+        run_lease(client, lease, update_log_callback, stop_event, driver_factory=driver_factory, **process_kwargs)
+        done += 1
+    update_log_callback(f"Agente {client.agent} encerrado: {done} lease(s) conferido(s).")
+    return done
+
+
+# --- LINHA DE COMANDO ---
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Verificador de Tarifas distribuído (coordenador e agentes)")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    serve = sub.add_parser('serve', help="Coordenador: divide os CSVs em leases e junta os resultados")
+    serve.add_argument('--csv', nargs='+', required=True, help="Arquivos CSV exportados do PMS")
+    serve.add_argument('--date', default=date.today().strftime("%d/%m/%Y"), help="Data Alvo (DD/MM/AAAA ou DD/MM/AAAA-DD/MM/AAAA)")
+    serve.add_argument('--ignore', default='', help="Quartos a ignorar, separados por vírgula")
+    serve.add_argument('--out', default='-', help="Arquivo de saída .csv ou .jsonl ('-' = JSONL no stdout)")
+    serve.add_argument('--per-stay', action='store_true', help="Confere todas as noites entre Arrival e Departure")
+    serve.add_argument('--host', default='127.0.0.1', help="Endereço do servidor (0.0.0.0 para aceitar outras máquinas)")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--token', help="Senha compartilhada exigida dos agentes (recomendada fora do 127.0.0.1)")
+    serve.add_argument('--lease-size', type=int, default=LEASE_SIZE)
+    serve.add_argument('--lease-timeout', type=float, default=LEASE_TIMEOUT, help="Segundos sem notícias do agente até o lease ser reatribuído")
+
+    agent = sub.add_parser('agent', help="Agente: confere os leases com o navegador desta máquina")
+    agent.add_argument('--url', required=True, help="Endereço do coordenador, ex: http://192.168.0.10:8765")
+    agent.add_argument('--token')
+    agent.add_argument('--name', help="Nome do agente nos logs do coordenador (padrão: máquina-pid)")
+    agent.add_argument('--property', action='append', help="Só pega reservas desta Property (ex: H5021); pode repetir")
+    agent.add_argument('--workers', type=int, default=1, help="Navegadores em paralelo")
+    agent.add_argument('--debugger', action='append', help=f"Endereço do Chrome em depuração (padrão {ratecheck.DEBUGGER_ADDRESS}); pode repetir")
+    agent.add_argument('--no-cache', action='store_true', help="Não usa o cache de e-mails")
+    agent.add_argument('--cache-path')
+    agent.add_argument('--ai', choices=sorted(set(AI_MODES.values())), default='lazy', help="Carga da IA de backup")
+    agent.add_argument('--fetch', choices=sorted(set(FETCH_BACKENDS.values())), default='dom', help="Busca dos e-mails: interface (dom) ou rede da sessão (rede)")
+    return parser
+
+
+def serve_main(args):
+    from ratecheck_cli import ResultWriter
+    try: audit_dates = parse_audit_dates(args.date)
+    except ValueError as e:
+        log(str(e))
+        return 1
+    df = load_reservations(args.csv, log)
+    if df is None: return 1
+    writer = ResultWriter(args.out, audit_dates if len(audit_dates) > 1 and not args.per_stay else (), args.per_stay)
+    ignore_set = {x.strip() for x in args.ignore.split(',') if x.strip()}
+
+    def on_result(index, result, agent):
+        writer.write(index, result)
+        if agent: log(f"[{agent}] Quarto {result['Quarto']}: {result['Status']}")
+
+    coordinator = AuditCoordinator(df, args.date, args.per_stay, ignore_set, args.lease_size, args.lease_timeout, log, on_result)
+    server = start_server(coordinator, args.host, args.port, args.token)
+    log(f"Coordenador em http://{args.host}:{server.server_address[1]} aguardando agentes...")
+    try:
+        while not coordinator.finished.wait(0.5): pass
+        # Agentes ainda pedindo lease recebem o aviso de fim antes do servidor fechar
+        time.sleep(AGENT_POLL * 1.5)
+    except KeyboardInterrupt:
+        log("Interrompendo (o relatório fica com as reservas já decididas)...")
+    finally:
+        server.shutdown()
+        writer.close()
+
+    results = coordinator.results()
+    status = coordinator.status()
+    counts = Counter(r['Status'] for r in results)
+    log(f"Agentes: {', '.join(f'{a}: {n}' for a, n in status['por_agente'].items()) or 'nenhum'} | Reatribuições: {status['reatribuicoes']}")
+    log("Resumo: " + (", ".join(f"{s}: {n}" for s, n in counts.most_common()) or "nenhuma reserva processada"))
+    return 0 if coordinator.finished.is_set() else 130
+
+
+def agent_main(args):
+    from email_cache import EmailCache, DEFAULT_CACHE_PATH
+    email_cache = None if args.no_cache else EmailCache(args.cache_path or DEFAULT_CACHE_PATH)
+    stop_event = threading.Event()
+    worker = threading.Thread(target=run_agent, args=(args.url, log, stop_event, args.name, args.property or (), args.token),
+                              kwargs={'workers': args.workers, 'debugger_addresses': args.debugger, 'email_cache': email_cache,
+                                      'ai_mode': args.ai, 'fetch_backend': args.fetch})
+    worker.start()
+    try:
+        while worker.is_alive(): worker.join(0.5)
+    except KeyboardInterrupt:
+        # O lease em andamento é encerrado: o que ficou sem resultado volta para a fila do coordenador
+        log("Interrompendo...")
+        stop_event.set()
+        worker.join()
+    finally:
+        if email_cache: email_cache.close()
+    return 130 if stop_event.is_set() else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return serve_main(args) if args.mode == 'serve' else agent_main(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
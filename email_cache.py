@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+import time
+
+# --- CACHE DE E-MAILS (SQLite) ---
+# Guarda o texto já extraído de cada e-mail de confirmação, por External Reference,
+# para que auditorias repetidas (ex: estadias longas) não voltem ao navegador.
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_cache.sqlite")
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+class EmailCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_hours=DEFAULT_TTL_HOURS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Usado pelos workers do processamento, por isso check_same_thread=False + lock próprio
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS emails ("
+            " ref TEXT PRIMARY KEY,"
+            " body TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_accessed ON emails(accessed_at)")
+        self._conn.commit()
+
+    def get(self, ref):
+        """Devolve o texto guardado para a referência, ou None se não existir / estiver expirado."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT body, fetched_at FROM emails WHERE ref = ?", (ref,)).fetchone()
+            if row is None:
+                return None
+            body, fetched_at = row
+            if now - fetched_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM emails WHERE ref = ?", (ref,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE emails SET accessed_at = ? WHERE ref = ?", (now, ref))
+            self._conn.commit()
+            return body
+
+    def put(self, ref, body):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO emails (ref, body, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (ref, body, len(body.encode('utf-8')), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Remove expirados e, se passar do limite de tamanho, os menos acessados (LRU)
+        self._conn.execute("DELETE FROM emails WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM emails").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for ref, size in self._conn.execute("SELECT ref, size FROM emails ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM emails WHERE ref = ?", (ref,))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,166 @@
+import json
+import re
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+# --- BUSCA DE E-MAILS PELA REDE ---
+# Em vez de digitar na busca, clicar no resultado e raspar o corpo, faz as requisições de busca e de
+# mensagem de dentro da página já autenticada (BrowserTransport), várias referências ao mesmo tempo.
+# HttpTransport faz o mesmo direto por HTTP (ex: servidor local de testes em bench/).
+#
+# Vem desligada: os endpoints dependem do webmail em uso e precisam aceitar só a sessão da página (cookies),
+# sem token próprio. Copie as requisições da aba Network do DevTools ao buscar um e-mail e preencha
+# search_url/message_url; sem eles, "rede" segue pela interface. EXAMPLE_ENDPOINTS mostra o formato.
+MAIL_API = {
+    'search_url': None,                            # ex: EXAMPLE_ENDPOINTS['search_url'], com {ref}
+    'message_url': None,                           # ex: EXAMPLE_ENDPOINTS['message_url'], com {id}
+    'items_field': 'value',                        # lista de mensagens na resposta da busca
+    'id_field': 'Id',
+    'match_fields': ('Subject', 'BodyPreview'),    # a mensagem certa contém a referência num destes campos
+    'body_field': 'Body.Content',                  # texto ou HTML do corpo na resposta da mensagem
+}
+# Contrato de exemplo (API JSON de busca + mensagem), usado pelo driver falso e pelo servidor local do bench
+EXAMPLE_ENDPOINTS = {
+    'search_url': '/mail/api/messages?$search="{ref}"&$select=Id,Subject,BodyPreview',
+    'message_url': '/mail/api/messages/{id}?$select=Body',
+}
+NETWORK_CONCURRENCY = 8
+
+
+class MailApiError(Exception):
+    pass
+
+
+def get_field(data, path):
+    """Lê um campo por caminho com pontos ('Body.Content')."""
+    for key in path.split('.'):
+        if not isinstance(data, dict): return None
+        data = data.get(key)
+    return data
+
+
+class _TextExtractor(HTMLParser):
+    BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'): self._skip += 1
+        elif tag in self.BLOCK_TAGS: self.parts.append('\n')
+        elif tag == 'td': self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'): self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS: self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip: self.parts.append(data)
+
+
+def html_to_text(body):
+    """Aproxima o texto visível do corpo (como o .text do Selenium): uma linha por bloco."""
+    if '<' not in body:
+        return body.strip()
+    parser = _TextExtractor()
+    parser.feed(body)
+    lines = (re.sub(r'[ \t\r\f\v\xa0]+', ' ', line).strip() for line in ''.join(parser.parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+# --- TRANSPORTES ---
+# get_json_many(urls) -> lista de respostas JSON ou MailApiError, na ordem das urls
+
+_FETCH_SCRIPT = """
+const urls = arguments[0], done = arguments[arguments.length - 1];
+Promise.all(urls.map(u => fetch(u, {credentials: 'include', headers: {'Accept': 'application/json'}})
+    .then(r => r.ok ? r.json().then(data => ({ok: true, data: data})) : {ok: false, error: 'HTTP ' + r.status})
+    .catch(e => ({ok: false, error: String(e)}))
+)).then(done);
+"""
+
+
+class BrowserTransport:
+    """Requisições feitas pela própria página do webmail (cookies e sessão do usuário), em paralelo."""
+    def __init__(self, driver, timeout=30):
+        self.driver = driver
+        self.timeout = timeout
+
+    def get_json_many(self, urls):
+        self.driver.set_script_timeout(self.timeout)
+        responses = self.driver.execute_async_script(_FETCH_SCRIPT, list(urls))
+        return [r['data'] if r.get('ok') else MailApiError(r.get('error', 'falha')) for r in responses]
+
+
+class HttpTransport:
+    """Requisições HTTP diretas a partir do Python (base_url + cookies/cabeçalhos opcionais)."""
+    def __init__(self, base_url, cookies=None, headers=None, timeout=30, max_workers=NETWORK_CONCURRENCY):
+        self.base_url = base_url
+        self.headers = {'Accept': 'application/json', **(headers or {})}
+        if cookies:
+            self.headers['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in cookies)
+        self.timeout = timeout
+        self.max_workers = max_workers
+
+    def _get(self, url):
+        request = urllib.request.Request(urllib.parse.urljoin(self.base_url, url), headers=self.headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except Exception as e:
+            return MailApiError(str(e))
+
+    def get_json_many(self, urls):
+        urls = list(urls)
+        if len(urls) <= 1:
+            return [self._get(u) for u in urls]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as pool:
+            return list(pool.map(self._get, urls))
+
+
+class MailApiBackend:
+    def __init__(self, config=None):
+        self.config = {**MAIL_API, **(config or {})}
+
+    @property
+    def configured(self):
+        return bool(self.config['search_url'] and self.config['message_url'])
+
+    def _pick_message(self, data, ref):
+        items = get_field(data, self.config['items_field']) if isinstance(data, dict) else data
+        for item in items or []:
+            if any(ref in str(get_field(item, f) or '') for f in self.config['match_fields']):
+                return get_field(item, self.config['id_field'])
+        return None
+
+    def fetch_many(self, transport, refs):
+        """Devolve {ref: texto do corpo ou MailApiError}. Busca e mensagens são pedidas em paralelo."""
+        refs = list(refs)
+        results = {}
+        searches = transport.get_json_many(self.config['search_url'].format(ref=urllib.parse.quote(r)) for r in refs)
+
+        found = []
+        for ref, data in zip(refs, searches):
+            if isinstance(data, Exception):
+                results[ref] = data
+                continue
+            message_id = self._pick_message(data, ref)
+            if message_id is None:
+                results[ref] = MailApiError("E-mail não encontrado na busca.")
+            else:
+                found.append((ref, message_id))
+
+        messages = transport.get_json_many(self.config['message_url'].format(id=urllib.parse.quote(str(mid), safe='')) for _, mid in found)
+        for (ref, _), data in zip(found, messages):
+            body = None if isinstance(data, Exception) else get_field(data, self.config['body_field'])
+            if isinstance(data, Exception):
+                results[ref] = data
+            elif not body:
+                results[ref] = MailApiError("Mensagem sem corpo.")
+            else:
+                results[ref] = html_to_text(str(body))
+        return results
@@ -0,0 +1,78 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# --- PERFIL DA EXECUÇÃO ---
+# Tempos por etapa do processamento (busca, clique, leitura do corpo, regex, IA...) e contadores
+# (estratégia que resolveu cada e-mail, cache, timeouts), para achar as etapas lentas com dados.
+
+
+def percentile(sorted_values, pct):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada."""
+    if not sorted_values: return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100) - 1))
+    return sorted_values[k]
+
+
+class RunProfile:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timings = {}
+            self.counters = {}
+            self.rows = 0
+            self.started_at = time.perf_counter()
+            self.finished_at = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def row_done(self):
+        with self._lock:
+            self.rows += 1
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def summary(self):
+        with self._lock:
+            elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+            stages = {}
+            for name, values in self.timings.items():
+                ordered = sorted(values)
+                stages[name] = {'n': len(ordered), 'p50': percentile(ordered, 50), 'p95': percentile(ordered, 95),
+                                'max': ordered[-1], 'total': sum(ordered)}
+            return {'duracao_s': elapsed, 'linhas': self.rows,
+                    'linhas_por_minuto': self.rows / elapsed * 60 if elapsed > 0 else 0.0,
+                    'etapas': stages, 'contadores': dict(sorted(self.counters.items()))}
+
+    def format_summary(self):
+        data = self.summary()
+        lines = [f"Perfil: {data['linhas']} reserva(s) em {data['duracao_s']:.1f}s ({data['linhas_por_minuto']:.1f} por minuto)"]
+        for name, s in sorted(data['etapas'].items(), key=lambda item: -item[1]['total']):
+            lines.append(f"  {name:<20} n={s['n']:<5} p50={s['p50'] * 1000:8.1f}ms  p95={s['p95'] * 1000:8.1f}ms  max={s['max'] * 1000:8.1f}ms  total={s['total']:.1f}s")
+        if data['contadores']:
+            lines.append("  " + ", ".join(f"{k}: {v}" for k, v in data['contadores'].items()))
+        return lines
+
+    def export(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,241 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# --- REGRAS DE EXTRAÇÃO DE TARIFA ---
+# Cada formato de confirmação é uma regra registrada em RATE_RULES. Uma varredura barata do texto
+# (marcadores em minúsculas, próprios de cada formato) escolhe quais regras rodam, então cada
+# e-mail só passa pelos parsers do seu formato e suportar outra rede é só registrar uma regra.
+# O resultado de cada regra sai marcado com o seu ID (ex: "Padrão Accor (Único) [accor.diaria]").
+
+# --- Mapeamento de Meses (Inglês / Português / Espanhol -> Número) ---
+MONTH_MAP = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6,
+    'julho': 7, 'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12,
+    'fev': 2, 'abr': 4, 'mai': 5, 'ago': 8, 'set': 9, 'out': 10, 'dez': 12,
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'mayo': 5, 'junio': 6, 'julio': 7,
+    'septiembre': 9, 'setiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12, 'ene': 1, 'dic': 12,
+}
+
+CURRENCIES = {'R$': 'BRL', 'US$': 'USD', 'U$': 'USD', '$': 'USD', '€': 'EUR', '£': 'GBP',
+              'BRL': 'BRL', 'USD': 'USD', 'EUR': 'EUR', 'GBP': 'GBP', 'ARS': 'ARS', 'CLP': 'CLP', 'MXN': 'MXN'}
+# As regras rodam sobre o texto em minúsculas (sem re.IGNORECASE, que deixa as alternâncias lentas);
+# os valores são lidos do texto original pelas mesmas posições (ver RuleMatch)
+CURRENCY = r"(r\$|us\$|u\$|€|£|\$|brl|usd|eur|gbp|ars|clp|mxn)"
+AMOUNT = r"(\d[\d.,]*)"
+DATE = (r"(?:\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2}"
+        r"|\d{1,2}(?:\s+de)?\s+[a-zà-ÿ]+\.?(?:\s+de)?,?\s+\d{4}"
+        r"|[a-zà-ÿ]+\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})")
+WEEKDAY_PREFIX = r"(?:[a-zà-ÿ\-]+,\s*)?"
+
+def parse_amount(text):
+    """
+    Valor monetário em qualquer formato comum: 1,842.98 / 1.842,98 / 316,35 / 1,044 / 430.00.
+    O último separador é o decimal, a não ser que venha seguido de 3 dígitos (milhar).
+    """
+    clean = re.sub(r'[^\d.,]', '', text).strip('.,')
+    if not clean: return 0.0
+    last = max(clean.rfind(','), clean.rfind('.'))
+    if last == -1: return float(clean)
+    separator, decimals = clean[last], clean[last + 1:]
+    if ('.' in clean) != (',' in clean) and (len(decimals) == 3 or clean.count(separator) > 1):
+        return float(clean.replace(separator, ''))
+    return float(re.sub(r'[.,]', '', clean[:last]) + '.' + decimals)
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """Data em DD/MM/AAAA, AAAA-MM-DD, '5 de dezembro de 2025', 'December 5, 2025', '5 Dec 2025'... ou None."""
+    text = text.strip()
+    try:
+        if re.fullmatch(r"\d{1,2}/\d{1,2}/\d{4}", text): return datetime.strptime(text, "%d/%m/%Y")
+        if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text): return datetime.strptime(text, "%Y-%m-%d")
+    except ValueError:
+        return None
+    month = day = year = None
+    for token in re.findall(r"[A-Za-zÀ-ÿ]+|\d+", text):
+        if token.isdigit():
+            if len(token) == 4: year = int(token)
+            elif day is None: day = int(token)
+        elif month is None:
+            month = MONTH_MAP.get(token.lower())
+    try:
+        return datetime(year, month, day) if month and day and year else None
+    except ValueError:
+        return None
+
+
+class RateRule:
+    """
+    kind='periodo': build(match) -> (início, fim, tarifa, rótulo, moeda) ou None; todas as regras de período
+    contribuem, na ordem em que aparecem no texto. kind='diaria': build(match) -> (tarifa, rótulo, moeda);
+    vale a primeira regra (na ordem do registro) que encontrar algo, e só se não houver períodos.
+    pattern é escrito em minúsculas (roda sobre o texto em minúsculas); build recebe um RuleMatch.
+    markers: alternativas de trechos em minúsculas; a regra roda se alguma aparecer no texto. Uma alternativa
+    pode ser uma tupla de trechos que precisam aparecer todos (ex: ('from ', ' to ', 'r$')).
+    marks_table: um match de período indica tabela de períodos mesmo se build devolver None (formato Accor);
+    nas regras genéricas, só um período construído desliga as tarifas únicas.
+    """
+    def __init__(self, rule_id, kind, pattern, build, markers, marks_table=False):
+        self.rule_id = rule_id
+        self.kind = kind
+        self.pattern = pattern
+        self.build = build
+        self.markers = tuple((m,) if isinstance(m, str) else tuple(m) for m in markers)
+        self.marks_table = marks_table
+
+
+class RuleMatch:
+    """Match sobre o texto em minúsculas; group() devolve o trecho correspondente do texto original."""
+    def __init__(self, match, text):
+        self.match = match
+        self.text = text
+
+    def group(self, i):
+        return self.text[self.match.start(i):self.match.end(i)]
+
+    def groups(self):
+        return tuple(self.group(i) for i in range(1, len(self.match.groups()) + 1))
+
+
+RATE_RULES = []
+_markers = None
+
+
+def register_rule(rule):
+    global _markers
+    RATE_RULES.append(rule)
+    _markers = None
+    return rule
+
+
+def _all_markers():
+    global _markers
+    if _markers is None:
+        _markers = frozenset(part for r in RATE_RULES for m in r.markers for part in m)
+    return _markers
+
+
+def lower_text(text):
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Raros caracteres que mudam de tamanho ao baixar a caixa (ex: 'İ'): mantidos como estão, para as posições baterem
+        lowered = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    return lowered
+
+
+def currency_code(symbol):
+    """'R$' -> 'BRL', 'us$' -> 'USD', '€' -> 'EUR'... (o CSV do PMS é em reais: quem compara decide o que fazer com as outras)"""
+    return CURRENCIES.get(symbol.upper(), 'BRL')
+
+
+def route(lowered):
+    """Varredura barata do texto em minúsculas: devolve as regras com alguma alternativa de marcadores presente."""
+    present = {m for m in _all_markers() if m in lowered}
+    return [r for r in RATE_RULES if any(present.issuperset(m) for m in r.markers)]
+
+
+class Extraction:
+    def __init__(self, periods, per_night, has_periods):
+        self.periods = periods          # [(início, fim, tarifa, método, moeda)], na ordem do texto
+        self.per_night = per_night      # (tarifa, método, moeda) ou None
+        self.has_periods = has_periods  # o e-mail tem tabela de períodos (mesmo que com datas inválidas)
+
+
+def extract_rates(text):
+    """Roda só as regras roteadas para o texto. Cada método sai marcado com o ID da regra: 'rótulo [id]'."""
+    lowered = lower_text(text)
+    rules = route(lowered)
+    found, claimed, has_periods, per_night = [], set(), False, None
+    for rule in rules:
+        if rule.kind == 'periodo':
+            for match in rule.pattern.finditer(lowered):
+                has_periods = has_periods or rule.marks_table
+                # A mesma linha reconhecida por duas regras de período conta uma vez (vale a registrada antes)
+                if match.start() in claimed: continue
+                claimed.add(match.start())
+                period = rule.build(RuleMatch(match, text))
+                if period:
+                    has_periods = True
+                    found.append((match.start(), period[:3] + (f"{period[3]} [{rule.rule_id}]", period[4])))
+        elif per_night is None and not has_periods:
+            # A tarifa única só vale sem tabela de períodos (regras 'periodo' vêm antes no registro)
+            for match in rule.pattern.finditer(lowered):
+                built = rule.build(RuleMatch(match, text))
+                if built and built[0] > 0:
+                    per_night = (built[0], f"{built[1]} [{rule.rule_id}]", built[2])
+                    break
+    found.sort(key=lambda item: item[0])
+    return Extraction([period for _, period in found], per_night, has_periods)
+
+
+def has_rate(text):
+    """O texto tem alguma tarifa reconhecível por uma regra? (usado para saber se o corpo terminou de carregar)"""
+    lowered = lower_text(text)
+    return any(rule.pattern.search(lowered) for rule in route(lowered))
+
+
+# --- REGRAS ---
+
+# Accor, tabela "Rate Changes": "from Wednesday, November 19 2025 to Friday, November 21 2025 : R$401.40 BRL"
+# Grupo 1: Mês Ini, G2: Dia Ini, G3: Ano Ini / G4: Mês Fim, G5: Dia Fim, G6: Ano Fim / G7: Valor
+# As regras Accor ficam presas ao formato original (R$); outras moedas caem nas regras genéricas
+PATTERN_PERIOD = re.compile(r"from .*?, ([a-z]+) (\d+) (\d{4}) to .*?, ([a-z]+) (\d+) (\d{4})\s*:\s*r\$\s*" + AMOUNT)
+
+def _accor_period(m):
+    month_i, day_i, year_i, month_f, day_f, year_f, amount = m.groups()
+    try:
+        start = datetime(int(year_i), MONTH_MAP[month_i.lower()], int(day_i))
+        end = datetime(int(year_f), MONTH_MAP[month_f.lower()], int(day_f))
+    except (KeyError, ValueError):
+        return None
+    if start < end:
+        return start, end, parse_amount(amount), f"Tarifa do Período ({day_i}/{month_i}-{day_f}/{month_f})", 'BRL'
+    return None
+
+register_rule(RateRule('accor.periodos', 'periodo', PATTERN_PERIOD, _accor_period, [('from ', ' to ', 'r$')], marks_table=True))
+
+# Períodos com outros formatos de data/idioma: "de 05/12/2025 a 07/12/2025: R$ 350,00", "from 2025-12-05 to 2025-12-07 - USD 120"
+PATTERN_PERIOD_DATES = re.compile(
+    r"\b(?:from|de|desde|del)\s+" + WEEKDAY_PREFIX + "(" + DATE + r")\s+(?:to|a|até|ate|al|hasta|-)\s+" + WEEKDAY_PREFIX + "(" + DATE + r")"
+    r"\s*[:\-–]?\s*" + CURRENCY + r"\s*" + AMOUNT)
+
+def _dated_period(m):
+    # Sem valor (ex: "cancelamento gratuito de 01/12 a 03/12 - R$ 0,00") não é tarifa
+    amount = parse_amount(m.group(4))
+    if amount <= 0: return None
+    start, end = parse_date(m.group(1)), parse_date(m.group(2))
+    if start and end and start < end:
+        return start, end, amount, f"Tarifa do Período ({start:%d/%m}-{end:%d/%m})", currency_code(m.group(3))
+    return None
+
+PERIOD_MARKERS = {'from ': (' to ',), 'de ': (' a ', ' até ', ' ate '), 'desde ': (' hasta ',), 'del ': (' al ',)}
+register_rule(RateRule('generico.periodos', 'periodo', PATTERN_PERIOD_DATES, _dated_period,
+                       [(start, sep) for start, seps in PERIOD_MARKERS.items() for sep in seps + ('-',)]))
+
+# Accor, tarifa única: "Daily rate : R$522.00 BRL per night"
+PATTERN_PER_NIGHT = re.compile(r":\s*r\$\s*" + AMOUNT + r"\s*brl\s*per night")
+register_rule(RateRule('accor.diaria', 'diaria', PATTERN_PER_NIGHT,
+                       lambda m: (parse_amount(m.group(1)), "Padrão Accor (Único)", 'BRL'), [('r$', 'brl', 'per night')]))
+
+# Diária com rótulo antes do valor: "Nightly rate: USD 120.00", "Valor da diária: R$ 350,00", "Tarifa por noche: $ 95"
+PATTERN_LABELED = re.compile(r"(?:daily rate|nightly rate|rate per night|valor da diária|tarifa diária|diária|tarifa por noite|tarifa por noche)"
+                             r"\s*:?\s*" + CURRENCY + r"\s*" + AMOUNT)
+register_rule(RateRule('generico.rotulo', 'diaria', PATTERN_LABELED,
+                       lambda m: (parse_amount(m.group(2)), "Diária (rótulo)", currency_code(m.group(1))),
+                       ('daily rate', 'nightly rate', 'rate per night', 'diária', 'tarifa por noite', 'tarifa por noche')))
+
+# "per night" em outras moedas/sem o BRL: ": USD 120.00 per night". Depois das regras com rótulo, pois
+# também pega taxas avulsas ("Please note: $ 25 per night resort fee")
+PATTERN_PER_NIGHT_ANY = re.compile(r":\s*" + CURRENCY + r"\s*" + AMOUNT + r"\s*(?:brl|usd|eur|gbp)?\s*per night")
+register_rule(RateRule('generico.diaria', 'diaria', PATTERN_PER_NIGHT_ANY,
+                       lambda m: (parse_amount(m.group(2)), "Tarifa por Noite", currency_code(m.group(1))), ('per night',)))
+
+# Valor seguido de "por noite": "R$ 350,00 por noite", "BRL 349.00 each night", "€89 a night", "USD 120/night"
+PATTERN_NIGHTLY_TEXT = re.compile(CURRENCY + r"\s*" + AMOUNT + r"\s*(?:brl|usd|eur|gbp)?\s*(?:each night|a night|/\s*night|por noite|/\s*noite|por noche|/\s*noche)")
+register_rule(RateRule('generico.texto', 'diaria', PATTERN_NIGHTLY_TEXT,
+                       lambda m: (parse_amount(m.group(2)), "Tarifa por Noite (texto)", currency_code(m.group(1))),
+                       ['each night', 'a night', ('/', 'night'), 'por noite', ('/', 'noite'), 'por noche', ('/', 'noche')]))
@@ -0,0 +1,1041 @@
+# Núcleo do verificador de tarifas: leitura dos CSVs, busca dos e-mails e extração das tarifas.
+# Não depende de interface gráfica (ver Rate.py para a GUI e ratecheck_cli.py para o modo headless).
+import pandas as pd
+import re
+from datetime import datetime, timedelta
+import threading
+import queue
+import bisect
+import functools
+import importlib.util
+import hashlib
+import time
+
+# Importações do Selenium
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.common.keys import Keys
+
+from profiler import RunProfile
+from mail_api import MailApiBackend, BrowserTransport, NETWORK_CONCURRENCY
+from rate_rules import extract_rates, has_rate
+
+# --- IMPORTAÇÕES DE IA ---
+# O transformers só é importado quando o modelo for carregado (ver SmartEmailReader.load_model)
+AI_AVAILABLE = importlib.util.find_spec("transformers") is not None
+
+# --- CONFIGURAÇÕES ---
+DEBUGGER_ADDRESS = "localhost:9222"
+# Timeout máximo (s) de cada seletor do webmail; na prática se ajusta à latência observada (AdaptiveTimeouts)
+SELECTOR_TIMEOUTS = {'busca': 5, 'resultado': 5, 'corpo': 5}
+WAIT_POLL = 0.05               # intervalo entre verificações da página
+BODY_FALLBACK_GRACE = 1.0      # div[role="main"] antes do timeout cheio do ID: só depois disso e se já tiver a referência e uma tarifa
+BODY_STABLE_INTERVAL = 0.1     # o corpo é lido quando o texto se repete em BODY_STABLE_READS leituras seguidas
+BODY_STABLE_READS = 3
+BODY_MIN_SETTLE = 0.5          # texto estável mas sem tarifa reconhecível: espera ao menos o tempo fixo antigo
+BODY_STABLE_TIMEOUT = 3.0
+PIPELINE_DEPTH = 16        # e-mails já buscados aguardando leitura; com a fila cheia os navegadores esperam
+PARSE_WORKERS = 2          # mínimo de threads de leitura/comparação (regex e IA) atrás dos navegadores
+AI_BATCH_SIZE = 8          # e-mails por chamada do pipeline de IA
+AI_BATCH_WAIT = 0.05       # segundos aguardando outros workers para completar o lote
+AI_MAX_SEQ_LEN = 384       # janela deslizante sobre o texto completo (em tokens)
+AI_DOC_STRIDE = 128
+AI_QUANTIZE = False        # quantização dinâmica int8 (CPU)
+AI_THREADS = None          # threads do torch; None = padrão
+
+# --- CLASSE DE IA ---
+# Modos da IA de backup: aquecer em segundo plano, carregar só no primeiro uso, ou não usar
+AI_MODES = {"Em segundo plano": "background", "Sob demanda": "lazy", "Desligada": "off"}
+
+class SmartEmailReader:
+    def __init__(self, batch_size=AI_BATCH_SIZE, quantize=AI_QUANTIZE, num_threads=AI_THREADS):
+        self.qa_pipeline = None
+        self.model_loaded = False
+        self.enabled = True
+        self.load_error = None
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()
+        self._loader = None
+        self._requests = queue.Queue()
+        self._batcher = None
+        self._primed = {}  # (contexto, pergunta) -> resposta já calculada num lote (ver prime)
+        self._primed_lock = threading.Lock()
+
+    def is_available(self):
+        return self.enabled and AI_AVAILABLE and self.load_error is None
+
+    def load_model(self, update_callback=None):
+        """Carrega o modelo (bloqueante). Chamadas concorrentes aguardam a mesma carga."""
+        if not AI_AVAILABLE: return False, "Sem bibliotecas de IA"
+        with self._load_lock:
+            if self.model_loaded: return True, "OK"
+            if self.load_error: return False, self.load_error
+            try:
+                if update_callback: update_callback("Carregando motor IA (Backup)...")
+                from transformers import pipeline
+                self.qa_pipeline = pipeline("question-answering", model="distilbert-base-cased-distilled-squad")
+                self._tune_for_cpu(update_callback)
+                self.model_loaded = True
+                if update_callback: update_callback("Motor IA Pronto!")
+                return True, "OK"
+            except Exception as e:
+                self.load_error = str(e)
+                return False, self.load_error
+
+    def _tune_for_cpu(self, update_callback=None):
+        if not (self.num_threads or self.quantize): return
+        import torch
+        if self.num_threads: torch.set_num_threads(int(self.num_threads))
+        if self.quantize:
+            self.qa_pipeline.model = torch.quantization.quantize_dynamic(self.qa_pipeline.model, {torch.nn.Linear}, dtype=torch.qint8)
+            if update_callback: update_callback("Motor IA quantizado (int8).")
+
+    def start_background_load(self, update_callback=None):
+        """Aquece o modelo numa thread enquanto o navegador trabalha."""
+        if not self.is_available() or self.model_loaded: return
+        if self._loader and self._loader.is_alive(): return
+        self._loader = threading.Thread(target=self.load_model, args=(update_callback,), daemon=True)
+        self._loader.start()
+
+    def unload(self):
+        with self._load_lock:
+            self.qa_pipeline = None
+            self.model_loaded = False
+
+    def configure(self, mode, update_callback=None):
+        self.enabled = mode != "off"
+        with self._primed_lock: self._primed = {}
+        if not self.enabled:
+            self.unload()
+        elif mode == "background":
+            self.start_background_load(update_callback)
+
+    def prime(self, pairs):
+        """
+        Responde de uma vez as perguntas de várias reservas (lotes de até batch_size) e guarda as respostas:
+        o ask_many de cada reserva, logo depois, não chama o modelo de novo. Usado pelo RowPipeline.
+        """
+        with self._primed_lock:
+            pairs = [p for p in dict.fromkeys(pairs) if p not in self._primed]
+        answers = self._ask(pairs)
+        with self._primed_lock: self._primed.update(zip(pairs, answers))
+
+    def ask_many(self, pairs):
+        """Responde várias perguntas (contexto, pergunta), reaproveitando as já respondidas por prime()."""
+        with self._primed_lock:
+            answers = [self._primed.get(p) for p in pairs]
+            missing = [i for i, p in enumerate(pairs) if p not in self._primed]
+        for i, answer in zip(missing, self._ask([pairs[i] for i in missing])):
+            answers[i] = answer
+        return answers
+
+    def _ask(self, pairs):
+        """Os pedidos entram numa fila que junta os de todos os workers em lotes de até batch_size por chamada do pipeline."""
+        if not pairs: return []
+        if not self.is_available(): return [None] * len(pairs)
+        # Primeiro e-mail que chega na IA: espera a carga em andamento (ou carrega agora)
+        if not self.model_loaded and not self.load_model()[0]: return [None] * len(pairs)
+
+        with self._load_lock:
+            if self._batcher is None or not self._batcher.is_alive():
+                self._batcher = threading.Thread(target=self._batch_loop, daemon=True)
+                self._batcher.start()
+
+        items = [{'context': c, 'question': q, 'done': threading.Event(), 'result': None} for c, q in pairs]
+        for item in items: self._requests.put(item)
+        for item in items: item['done'].wait()
+        return [item['result'] for item in items]
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.time() + AI_BATCH_WAIT
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._requests.get(timeout=max(0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            try:
+                results = self._run_pipeline(batch)
+            except Exception:
+                results = [None] * len(batch)
+            for item, res in zip(batch, results):
+                item['result'] = res; item['done'].set()
+
+    def _run_pipeline(self, batch):
+        # Texto completo em janelas deslizantes (max_seq_len/doc_stride): o pipeline
+        # avalia cada janela e devolve o trecho de maior score entre todas
+        with self._infer_lock:
+            out = self.qa_pipeline([{'question': i['question'], 'context': i['context']} for i in batch],
+                                   batch_size=self.batch_size, max_seq_len=AI_MAX_SEQ_LEN, doc_stride=AI_DOC_STRIDE)
+        return [out] if isinstance(out, dict) else list(out)
+
+ai_reader = SmartEmailReader()
+profiler = RunProfile()
+
+# --- FUNÇÕES DE LIMPEZA E LÓGICA ---
+
+def clean_money(val_str):
+    if not isinstance(val_str, str): return 0.0
+   
+    clean = re.sub(r'[^\d.,]', '', val_str)
+    
+    # Lógica para saber se ',' é decimal ou milhar
+    if ',' in clean and '.' in clean: 
+        # Ex: 1,842.98 -> tira a virgula
+        clean = clean.replace(',', '') 
+    elif ',' in clean:
+        # Ex: 316,35 -> troca por ponto
+        clean = clean.replace(',', '.')
+    
+    try:
+        return float(clean)
+    except:
+        return 0.0
+
+def clean_money_series(values):
+    """
+    clean_money para uma coluna inteira (ex: 'Rate ChangesR$430.00', "'-R$248.56").
+    Um map por valor: nas colunas de texto do pandas, a cadeia de .str.replace/.str.contains passa pelos
+    valores várias vezes e media ~4x mais lenta por valor que o próprio clean_money (ver bench/run_bench.py).
+    """
+    return values.fillna('').astype(str).map(clean_money).astype(float)
+
+class RateIndex:
+    """
+    Tarifas de um e-mail já parseadas: intervalos [início, fim) disjuntos e ordenados,
+    consultados por busca binária. 'issues' guarda sobreposições e lacunas encontradas.
+    """
+    def __init__(self, periods, per_night=None, has_periods=False, issues=()):
+        self.periods = periods  # [(inicio, fim, tarifa, método, moeda)]
+        self.starts = [p[0] for p in periods]
+        self.per_night = per_night  # (tarifa, método, moeda)
+        self.has_periods = has_periods
+        self.issues = list(issues)
+
+    def lookup(self, target_dt):
+        """Devolve (tarifa, método, moeda) para a data, ou None se o e-mail não cobrir a data."""
+        i = bisect.bisect_right(self.starts, target_dt) - 1
+        if i >= 0:
+            start, end, rate, method, currency = self.periods[i]
+            # Tarifa zerada não é tarifa: a data segue como não encontrada (e pode ir para a IA)
+            if target_dt < end and rate > 0:
+                return rate, method, currency
+        # Padrão único só vale se o e-mail não tiver tabela de períodos
+        if self.per_night is not None and not self.has_periods:
+            return self.per_night
+        return None
+
+@functools.lru_cache(maxsize=256)
+def parse_rate_index(email_text):
+    """
+    Faz a leitura (cara) do e-mail uma única vez; as consultas por data usam o índice.
+    As regras de rate_rules roteadas para o texto trazem os períodos (ex: tabela "Rate Changes")
+    e a tarifa única ("per night"), cada uma marcada com o ID da regra.
+    """
+    extraction = extract_rates(email_text)
+    raw = extraction.periods
+
+    # Validação: sobreposições (com tarifa diferente) e lacunas entre períodos
+    issues = []
+    covered_until = None
+    for p in sorted(set(raw), key=lambda p: (p[0], p[1])):
+        if covered_until is not None:
+            if p[0] < covered_until:
+                issues.append(f"Períodos sobrepostos a partir de {p[0]:%d/%m/%Y}")
+            elif p[0] > covered_until:
+                issues.append(f"Lacuna entre {covered_until:%d/%m/%Y} e {p[0]:%d/%m/%Y}")
+        covered_until = p[1] if covered_until is None else max(covered_until, p[1])
+
+    # Intervalos disjuntos: em sobreposição vale o primeiro período do texto (como na busca linear)
+    bounds = sorted({p[0] for p in raw} | {p[1] for p in raw})
+    periods = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        owner = next((p for p in raw if p[0] <= lo < p[1]), None)
+        if owner is None:
+            continue
+        if periods and periods[-1][1] == lo and periods[-1][2:] == owner[2:]:
+            periods[-1] = (periods[-1][0], hi) + owner[2:]
+        else:
+            periods.append((lo, hi) + owner[2:])
+
+    return RateIndex(periods, extraction.per_night, extraction.has_periods, issues)
+
+def find_rate_hybrid(email_text, target_date_str):
+    """
+    Lógica Avançada:
+    1. Procura períodos de datas (from X to Y) e verifica se a Data Alvo está dentro.
+    2. Se não achar por data, tenta a tarifa única (por noite).
+    3. Se não achar, tenta IA.
+    Os passos 1 e 2 usam só as regras de rate_rules roteadas para o formato do e-mail.
+    O e-mail é parseado uma vez (parse_rate_index) e reaproveitado entre datas.
+    Devolve (tarifa, método, moeda); a moeda vem da regra que achou a tarifa (IA e não encontrado = BRL).
+    """
+    return find_rates_hybrid(email_text, [target_date_str])[0]
+
+@functools.lru_cache(maxsize=1024)
+def parse_target_date(target_date_str):
+    # As mesmas poucas datas são consultadas em todo e-mail: strptime custa mais que a busca no índice
+    return datetime.strptime(target_date_str, "%d/%m/%Y")
+
+def ai_question(target_date_str):
+    return f"What is the daily rate for {target_date_str}?"
+
+def ai_pairs(email_text, target_date_strs):
+    """(contexto, pergunta) que a IA vai receber: as datas que nenhuma regra resolve (vazio com a IA indisponível)."""
+    if not ai_reader.is_available(): return []
+    index = parse_rate_index(email_text)
+    pairs = []
+    for target_date_str in target_date_strs:
+        try: target_dt = parse_target_date(target_date_str)
+        except ValueError: continue
+        if not index.lookup(target_dt): pairs.append((email_text, ai_question(target_date_str)))
+    return pairs
+
+def find_rates_hybrid(email_text, target_date_strs):
+    """Mesma lógica de find_rate_hybrid para várias datas; as que caem na IA vão num único lote."""
+    results = [None] * len(target_date_strs)
+    pending = []
+
+    # --- ESTRATÉGIAS 1 e 2: ÍNDICE DE PERÍODOS / PADRÃO ÚNICO ---
+    with profiler.stage('regex'):
+        index = parse_rate_index(email_text)
+        for i, target_date_str in enumerate(target_date_strs):
+            try:
+                target_dt = parse_target_date(target_date_str)
+            except:
+                results[i] = (0.0, "Data Alvo Inválida", 'BRL')
+                continue
+            found = index.lookup(target_dt)
+            if found: results[i] = found
+            else: pending.append(i)
+
+    # --- ESTRATÉGIA 4: IA (BACKUP FINAL) ---
+    if pending and ai_reader.is_available():
+        with profiler.stage('ia'):
+            answers = ai_reader.ask_many([(email_text, ai_question(target_date_strs[i])) for i in pending])
+        for i, res in zip(pending, answers):
+            if res and res['score'] > 0.1:
+                txt = res['answer']
+                val = clean_money(txt)
+                if 10 < val < 5000:
+                    results[i] = (val, f"IA ({res['score']:.2f}) [ia]", 'BRL')
+
+    results = [r or (0.0, "Não encontrado", 'BRL') for r in results]
+    for _, method, _ in results:
+        # Ex: "Tarifa do Período (19/November-21/November) [accor.periodos]" -> "estrategia:Tarifa do Período", "regra:accor.periodos"
+        profiler.count("estrategia:" + method.split(' (')[0])
+        if method.endswith(']'): profiler.count("regra:" + method[method.rindex('[') + 1:-1])
+    return results
+
+# --- PROCESSAMENTO ---
+class FetchError(Exception):
+    """Falha ao obter o e-mail de uma referência (busca, resultado ou leitura)."""
+    def __init__(self, status, email_label, message):
+        super().__init__(message)
+        self.status = status
+        self.email_label = email_label
+
+REPORT_COLUMNS = ('Quarto', 'Nome', 'Ref.', 'Tarifa CSV', 'Tarifa Email', 'Status')
+# Tarifa do e-mail em outra moeda (USD, EUR...): o CSV é em reais, então a conferência fica para o usuário
+FOREIGN_CURRENCY_STATUS = 'MOEDA DIFERENTE'
+# Resultados que não encerram a reserva: numa retomada (ver RunJournal) ela é conferida de novo
+RETRY_STATUSES = {'ERRO BUSCA', 'ERRO LEITURA', 'ERRO GERAL'}
+
+def make_result(room, name, ext_ref, rate_csv, rate_email, status):
+    return {'Quarto': room, 'Nome': name, 'Ref.': ext_ref, 'Tarifa CSV': rate_csv, 'Tarifa Email': rate_email, 'Status': status}
+
+def open_driver(debugger_address=DEBUGGER_ADDRESS, driver_path=None, new_tab=False):
+    options = webdriver.ChromeOptions()
+    options.debugger_address = debugger_address
+    service = Service(driver_path or ChromeDriverManager().install())
+    driver = webdriver.Chrome(service=service, options=options)
+    if new_tab:
+        # Aba própria para o worker, reaproveitando a sessão já autenticada
+        url = driver.current_url
+        driver.switch_to.new_window('tab')
+        driver.get(url)
+    return driver
+
+# --- ESPERAS DA PÁGINA ---
+class AdaptiveTimeouts:
+    """
+    Timeout por seletor ajustado à latência observada: ADAPTIVE_FACTOR x o p95 dos últimos sucessos,
+    nunca abaixo de ADAPTIVE_FLOOR nem acima do máximo configurado em SELECTOR_TIMEOUTS.
+    Quando o timeout reduzido estoura, a espera continua até o máximo (ver timed_wait): o rótulo do resultado
+    continua certo e a medida do sucesso tardio entra nas amostras, sem descartar as anteriores.
+    """
+    ADAPTIVE_FACTOR = 3.0
+    ADAPTIVE_FLOOR = 1.5
+    MIN_SAMPLES = 5
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+
+    def observe(self, key, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append(seconds)
+            del samples[:-50]
+
+    def get(self, key):
+        limit = self.limits[key]
+        with self._lock:
+            samples = sorted(self._samples.get(key, []))
+        if len(samples) < self.MIN_SAMPLES:
+            return limit
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(limit, max(self.ADAPTIVE_FLOOR, p95 * self.ADAPTIVE_FACTOR))
+
+wait_timeouts = AdaptiveTimeouts(SELECTOR_TIMEOUTS)
+
+def wait_for_any(driver, locators, timeout, clickable=False, grace=0.0, accept_early=None, started=None):
+    """
+    Verifica todos os localizadores a cada rodada e devolve (posição, elemento) do primeiro presente.
+    Os alternativos (posição > 0) só valem depois de 'grace' segundos (contados de 'started'), para o principal
+    ter preferência, a não ser que accept_early(elemento) seja verdadeiro.
+    """
+    started = time.perf_counter() if started is None else started
+    def condition(d):
+        elapsed = time.perf_counter() - started
+        for i, locator in enumerate(locators):
+            early = i > 0 and elapsed < grace
+            if early and accept_early is None:
+                break
+            for element in d.find_elements(*locator):
+                if clickable and not (element.is_displayed() and element.is_enabled()): continue
+                if early and not accept_early(element): continue
+                return i, element
+        return False
+    return WebDriverWait(driver, timeout, poll_frequency=WAIT_POLL, ignored_exceptions=(StaleElementReferenceException,)).until(condition)
+
+def timed_wait(key, driver, locators, clickable=False, grace=0.0, accept_early=None, scale=1):
+    """
+    wait_for_any com o timeout adaptativo do seletor (x scale). Se ele estourar, a espera continua na mesma
+    chamada até o máximo de SELECTOR_TIMEOUTS: só o TimeoutException final quer dizer que o elemento não veio.
+    """
+    started = time.perf_counter()
+    reduced, limit = wait_timeouts.get(key) * scale, wait_timeouts.limits[key] * scale
+    try:
+        return wait_for_any(driver, locators, reduced, clickable, grace, accept_early, started)
+    except TimeoutException:
+        if reduced >= limit: raise
+    profiler.count(f'espera:estendida:{key}')
+    return wait_for_any(driver, locators, max(0.0, limit - (time.perf_counter() - started)), clickable, grace, accept_early, started)
+
+def wait_for_stable_text(element, ready=None, interval=BODY_STABLE_INTERVAL, reads=BODY_STABLE_READS, timeout=BODY_STABLE_TIMEOUT):
+    """
+    Lê o texto até ele se repetir em 'reads' leituras seguidas (corpo terminou de renderizar), em vez de uma espera fixa.
+    Se ready(texto) for falso, o texto só é aceito depois de BODY_MIN_SETTLE, para não ler um corpo incompleto.
+    """
+    started = time.perf_counter()
+    last, repeats = element.text, 1
+    while True:
+        time.sleep(interval)
+        current = element.text
+        repeats = repeats + 1 if current == last else 1
+        elapsed = time.perf_counter() - started
+        stable = current and repeats >= reads
+        if (stable and (ready is None or ready(current) or elapsed >= BODY_MIN_SETTLE)) or elapsed >= timeout:
+            return current
+        last = current
+
+def fetch_email_text(driver, ext_ref, update_log_callback):
+    """Busca a referência no webmail, abre o e-mail e devolve o texto do corpo."""
+    # Busca
+    try:
+        with profiler.stage('busca'):
+            started = time.perf_counter()
+            _, search_box = timed_wait('busca', driver, [(By.ID, 'topSearchInput')], clickable=True)
+            wait_timeouts.observe('busca', time.perf_counter() - started)
+            search_box.clear(); search_box.send_keys(Keys.CONTROL + 'a'); search_box.send_keys(Keys.DELETE)
+            search_box.send_keys(ext_ref); search_box.send_keys(Keys.ENTER)
+    except Exception:
+        profiler.count('timeout:busca')
+        raise FetchError('ERRO BUSCA', 'ERRO', "Erro: Barra de busca inacessível.")
+
+    # Clica no Resultado
+    try:
+        with profiler.stage('resultado'):
+            started = time.perf_counter()
+            _, email_result = timed_wait('resultado', driver, [(By.XPATH, f'//div[@role="option" and contains(@aria-label, "{ext_ref}")]')], clickable=True)
+            wait_timeouts.observe('resultado', time.perf_counter() - started)
+            email_result.click()
+    except Exception:
+        profiler.count('timeout:resultado')
+        raise FetchError('EMAIL NÃO ENCONTRADO', 'N/A', "E-mail não encontrado.")
+
+    # --- ATUALIZAÇÃO PARA LER CORPO ---
+    try:
+        # Pelo ID específico do corpo ou, se ele não aparecer no timeout, pelo role="main" (caso o ID mude), como no código original.
+        # O role="main" pode ser a lista de mensagens: antes disso, só vale se já mostrar a referência e uma tarifa
+        def is_message(element):
+            if time.perf_counter() - started < BODY_FALLBACK_GRACE: return False
+            text = element.text
+            return ext_ref in text and has_rate(text)
+        with profiler.stage('corpo'):
+            started = time.perf_counter()
+            found, email_body = timed_wait('corpo', driver, [(By.ID, 'Pular para mensagem-region'), (By.CSS_SELECTOR, 'div[role="main"]')],
+                                           grace=wait_timeouts.limits['corpo'], accept_early=is_message, scale=2)
+            wait_timeouts.observe('corpo', time.perf_counter() - started)
+        if found: profiler.count('corpo:alternativo')
+
+        with profiler.stage('estabilizacao'):
+            email_text = wait_for_stable_text(email_body, ready=has_rate)
+    except Exception as ex_body:
+        profiler.count('timeout:corpo')
+        raise FetchError('ERRO LEITURA', '', f"Erro ao ler texto do email: {ex_body}")
+
+    # Tenta fechar
+    with profiler.stage('fechar'):
+        try: driver.find_element(By.CSS_SELECTOR, 'button[title="Fechar"]').click()
+        except Exception: pass
+
+    return email_text
+
+# Como buscar os e-mails: clicando na interface do webmail, ou pelas requisições da sessão (a interface fica como alternativa)
+FETCH_BACKENDS = {"Interface (cliques)": "dom", "Rede da sessão": "rede"}
+
+class EmailSource:
+    """
+    Origem dos textos de e-mail durante uma execução.
+    Linhas com a mesma referência compartilham uma única busca (mesmo entre workers),
+    e o EmailCache opcional evita voltar ao navegador em execuções seguintes.
+    Com network (MailApiBackend), prefetch() busca várias referências pela rede da sessão
+    antes do caminho pela interface; as que falharem seguem pelo DOM normalmente.
+    transport_factory(driver) cria o transporte das requisições (HttpTransport no teste com servidor local).
+    """
+    def __init__(self, cache=None, network=None, transport_factory=BrowserTransport):
+        self.cache = cache
+        self.network = network
+        self.transport_factory = transport_factory
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def prefetch(self, driver, refs, update_log_callback, stop_event=None):
+        """Busca as referências em lotes concorrentes pela rede; devolve quantas foram obtidas."""
+        with self._lock:
+            refs = [r for r in dict.fromkeys(refs) if r not in self._pending]
+        if self.cache is not None:
+            refs = [r for r in refs if self.cache.get(r) is None]
+        fetched = 0
+        transport = self.transport_factory(driver)
+        for start in range(0, len(refs), NETWORK_CONCURRENCY):
+            if stop_event is not None and stop_event.is_set(): break
+            chunk = refs[start:start + NETWORK_CONCURRENCY]
+            try:
+                with profiler.stage('rede'):
+                    found = self.network.fetch_many(transport, chunk)
+            except Exception as e:
+                update_log_callback(f"Busca pela rede indisponível, usando a interface: {e}")
+                break
+            for ref, text in found.items():
+                if isinstance(text, Exception):
+                    profiler.count('rede:falha')
+                    continue
+                profiler.count('rede:ok')
+                entry = {'done': threading.Event(), 'text': text, 'cached': False, 'fresh': True, 'error': None}
+                entry['done'].set()
+                with self._lock: self._pending.setdefault(ref, entry)
+                if self.cache is not None: self.cache.put(ref, text)
+                fetched += 1
+        return fetched
+
+    def get(self, driver, ext_ref, update_log_callback, refresh=False):
+        """Devolve (texto, veio_do_cache). Levanta FetchError se a busca falhar."""
+        with self._lock:
+            entry = self._pending.get(ext_ref)
+            # Um refresh só refaz a busca se o texto atual não veio do navegador nesta execução
+            owner = entry is None or (refresh and not entry['fresh'])
+            if owner:
+                entry = self._pending[ext_ref] = {'done': threading.Event(), 'text': None, 'cached': False, 'fresh': refresh, 'error': None}
+
+        if not owner:
+            entry['done'].wait()
+            if entry['error']: raise entry['error']
+            return entry['text'], entry['cached']
+
+        try:
+            text = None
+            if self.cache is not None and not refresh:
+                text = self.cache.get(ext_ref)
+            if text is not None:
+                entry['cached'] = True
+                profiler.count('cache:acerto')
+                update_log_callback("E-mail lido do cache.")
+            else:
+                if self.cache is not None: profiler.count('cache:falta')
+                text = fetch_email_text(driver, ext_ref, update_log_callback)
+                entry['fresh'] = True
+                if self.cache is not None: self.cache.put(ext_ref, text)
+            entry['text'] = text
+            return text, entry['cached']
+        except Exception as e:
+            entry['error'] = e
+            raise
+        finally:
+            entry['done'].set()
+
+def log_rate_issues(email_text, update_log_callback):
+    for issue in parse_rate_index(email_text).issues:
+        update_log_callback(f"Aviso: {issue}")
+
+def format_rate(value, currency='BRL'):
+    return f"R${value:.2f}" if currency == 'BRL' else f"{currency} {value:.2f}"
+
+def evaluate_row(room, name, ext_ref, rate_csv_val, email_text, target_date_str, update_log_callback):
+    log_rate_issues(email_text, update_log_callback)
+    # --- LÓGICA HÍBRIDA ---
+    rate_email_val, method_msg, currency = find_rate_hybrid(email_text, target_date_str)
+
+    # Comparação (o CSV é em reais: tarifa em outra moeda não é comparável sem câmbio)
+    if currency != 'BRL' and rate_email_val > 0:
+        status = FOREIGN_CURRENCY_STATUS
+    elif abs(rate_csv_val - rate_email_val) < 1.00 and rate_email_val > 0:
+        status = 'CORRETO'
+    else:
+        status = 'ERRO DE TARIFA'
+
+    update_log_callback(f"Status: {status} | CSV: {rate_csv_val} | Email: {format_rate(rate_email_val, currency)} [{method_msg}]")
+    return make_result(room, name, ext_ref, f"R${rate_csv_val:.2f}", format_rate(rate_email_val, currency), status)
+
+def parse_audit_dates(target_date_str):
+    """
+    'DD/MM/AAAA' -> [data]; 'DD/MM/AAAA-DD/MM/AAAA' -> todas as noites do intervalo (inclusivo).
+    Levanta ValueError (com a mensagem para o log) se a data não for válida ou o intervalo estiver invertido.
+    """
+    parts = [p.strip() for p in target_date_str.split('-')]
+    try:
+        dates = [datetime.strptime(p, "%d/%m/%Y") for p in parts]
+    except ValueError:
+        dates = []
+    if len(parts) == 1 and dates:
+        return [parts[0]]
+    if len(parts) != 2 or not dates:
+        raise ValueError(f"Data alvo inválida: '{target_date_str.strip()}' (use DD/MM/AAAA ou DD/MM/AAAA-DD/MM/AAAA).")
+    start, end = dates
+    if end < start:
+        raise ValueError(f"Intervalo de datas invertido: {parts[1]} é anterior a {parts[0]}.")
+    return [(start + timedelta(days=i)).strftime("%d/%m/%Y") for i in range((end - start).days + 1)]
+
+def stay_nights(row):
+    """Noites da estadia (Arrival até a véspera da Departure), no formato DD/MM/AAAA."""
+    try:
+        arrival = datetime.strptime(str(row.get("Arrival", "")).strip(), "%d/%m/%Y")
+        departure = datetime.strptime(str(row.get("Departure", "")).strip(), "%d/%m/%Y")
+    except ValueError:
+        return []
+    # Day use: cobra a própria data de chegada
+    total = max(1, (departure - arrival).days)
+    return [(arrival + timedelta(days=i)).strftime("%d/%m/%Y") for i in range(total)]
+
+def evaluate_nights(room, name, ext_ref, rate_csv_val, email_text, nights, update_log_callback):
+    """
+    Uma única leitura do e-mail, várias noites: monta a matriz de tarifa esperada
+    (uma coluna por noite, chave DD/MM/AAAA) e marca com ✗ as noites que divergem do CSV.
+    """
+    log_rate_issues(email_text, update_log_callback)
+    result = make_result(room, name, ext_ref, f"R${rate_csv_val:.2f}", '', '')
+    found, divergent, foreign = {}, [], False
+
+    for night, (rate_email_val, method_msg, currency) in zip(nights, find_rates_hybrid(email_text, nights)):
+        label = night
+        if rate_email_val <= 0:
+            result[label] = '?'
+            divergent.append(label)
+            continue
+        found.setdefault(currency, []).append(rate_email_val)
+        if currency == 'BRL' and abs(rate_csv_val - rate_email_val) < 1.00:
+            result[label] = format_rate(rate_email_val)
+        else:
+            result[label] = f"{format_rate(rate_email_val, currency)} ✗"
+            divergent.append(label)
+            foreign = foreign or currency != 'BRL'
+
+    ranges = []
+    for currency, values in found.items():
+        low, high = min(values), max(values)
+        ranges.append(format_rate(low, currency) if high - low < 0.01 else f"{format_rate(low, currency)}-{format_rate(high, currency)}")
+    result['Tarifa Email'] = ' / '.join(ranges)
+    result['Status'] = FOREIGN_CURRENCY_STATUS if foreign else ('CORRETO' if nights and not divergent else 'ERRO DE TARIFA')
+
+    update_log_callback(f"Status: {result['Status']} | CSV: {rate_csv_val} | {len(nights)} noite(s)" + (f" | Divergentes: {', '.join(divergent)}" if divergent else ""))
+    return result
+
+def load_reservations(csv_paths, update_log_callback):
+    """Lê e concatena os CSVs exportados do PMS. Devolve None se nenhum puder ser lido."""
+    all_dfs = []
+    for path in csv_paths:
+        try:
+            df_temp = pd.read_csv(path, dtype=str).fillna('')
+            all_dfs.append(df_temp)
+        except Exception as e:
+            update_log_callback(f"Erro ao ler arquivo {path}: {e}")
+
+    if not all_dfs:
+        update_log_callback("Nenhum CSV carregado corretamente.")
+        return None
+    df = pd.concat(all_dfs, ignore_index=True)
+
+    # Exportações paginadas se sobrepõem: uma linha por Confirmation Number (o arquivo posterior prevalece)
+    if "Confirmation Number" in df:
+        conf = df["Confirmation Number"].astype(str).str.strip()
+        duplicated = conf.duplicated(keep='last') & (conf != '')
+        if duplicated.any():
+            update_log_callback(f"{int(duplicated.sum())} reserva(s) duplicada(s) entre os arquivos removida(s).")
+            df = df[~duplicated].reset_index(drop=True)
+    return df
+
+def prepare_reservations(df, ignore_set):
+    """
+    Ingestão vetorizada: normaliza as colunas usadas, converte Rate ('_rate') e Adults, e
+    pré-classifica em '_status' as linhas que não precisam de navegador:
+    SHARE (Adultos < 1), sem External Reference e quartos ignorados. '_status' vazio = buscar e-mail.
+    """
+    df = df.copy()
+    for column, default in (("External Reference", ""), ("Rate", ""), ("Name", "N/A"), ("Room", "N/A"),
+                            ("Adults", "0"), ("Arrival", ""), ("Departure", "")):
+        df[column] = df[column].astype(str).str.strip() if column in df else default
+    df['_rate'] = clean_money_series(df['Rate'])
+
+    adults = pd.to_numeric(df['Adults'], errors='coerce').fillna(0).astype(int)
+    status = pd.Series('', index=df.index, dtype=object)
+    status[adults < 1] = 'IGNORADO (SHARE)'
+    status[(status == '') & (df['External Reference'] == '')] = 'SEM REF.'
+    status[(status == '') & df['Room'].isin(ignore_set)] = 'IGNORADO (QUARTO)'
+    df['_status'] = status
+    return df
+
+FINGERPRINT_COLUMNS = ("Rate", "Rate Code", "Room", "Arrival", "Departure", "External Reference")
+
+def reservation_fingerprint(rec, audit_key):
+    """Resumo dos campos que influenciam a conferência (e das datas conferidas, pois a tarifa esperada depende delas)."""
+    payload = "\x1f".join([str(rec.get(c, '')).strip() for c in FINGERPRINT_COLUMNS] + [audit_key])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def fetch_row(driver, source, rec, update_log_callback, refresh=False):
+    """Etapa de busca (navegador): devolve (texto, veio_do_cache), ou o resultado final se a busca falhar."""
+    ext_ref, room = rec["External Reference"], rec["Room"]
+    if not refresh: update_log_callback(f"--- Quarto: {room} (Ref: {ext_ref}) ---")
+    try:
+        return source.get(driver, ext_ref, update_log_callback, refresh=refresh)
+    except FetchError as fe:
+        update_log_callback(str(fe))
+        return make_result(room, rec["Name"], ext_ref, rec["Rate"], fe.email_label, fe.status)
+    except Exception as e:
+        update_log_callback(f"Erro Genérico no Quarto {room}: {str(e)}")
+        return make_result(room, rec["Name"], ext_ref, rec["Rate"], 'ERRO', 'ERRO GERAL')
+
+def decide_row(rec, email_text, audit_dates, update_log_callback, per_stay=False):
+    """Etapa de leitura (regex/IA) e comparação com o CSV, sem navegador."""
+    ext_ref, rate_csv_val, name, room = rec["External Reference"], rec["_rate"], rec["Name"], rec["Room"]
+    nights = stay_nights(rec) if per_stay else audit_dates
+    try:
+        if len(nights) == 1 and not per_stay:
+            return evaluate_row(room, name, ext_ref, rate_csv_val, email_text, nights[0], update_log_callback)
+        return evaluate_nights(room, name, ext_ref, rate_csv_val, email_text, nights, update_log_callback)
+    except Exception as e:
+        update_log_callback(f"Erro Genérico no Quarto {room}: {str(e)}")
+        return make_result(room, name, ext_ref, rec["Rate"], 'ERRO', 'ERRO GERAL')
+
+class RowPipeline:
+    """
+    Busca e leitura em estágios, para a espera do navegador e o processamento do texto (regex/IA)
+    acontecerem ao mesmo tempo: cada navegador coloca (linha, texto) numa fila limitada e as
+    threads de leitura consomem essa fila. Com a fila cheia os navegadores aguardam (backpressure);
+    stop_event interrompe os dois estágios; cada resultado vai para o seu índice em slots,
+    mantendo a ordem dos CSVs.
+    ai_pairs(reserva, texto) devolve as perguntas que a linha levaria à IA: essas linhas ficam retidas e
+    vão juntas para ai_prime(perguntas) a cada ai_batch_size linhas ou quando as buscas acabam, em vez de
+    uma chamada do modelo por linha.
+    """
+    def __init__(self, source, decide, slots, on_row_done, stop_event, depth=PIPELINE_DEPTH, ai_pairs=None, ai_prime=None, ai_batch_size=AI_BATCH_SIZE):
+        self.source = source
+        self.decide = decide
+        self.slots = slots
+        self.on_row_done = on_row_done
+        self.stop_event = stop_event
+        self.tasks = queue.Queue()                  # (índice, reserva, refresh, início)
+        self.ready = queue.Queue(maxsize=depth)     # (índice, reserva, resultado da busca, refresh, início)
+        self.finished = threading.Event()
+        self.ai_pairs = ai_pairs
+        self.ai_prime = ai_prime
+        self.ai_batch_size = ai_batch_size
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._to_fetch = 0      # linhas na fila de busca ou nas mãos de um navegador
+        self._held = []         # (item de ready, perguntas) aguardando o lote da IA
+
+    def add(self, index, rec):
+        with self._lock: self._remaining += 1
+        self._queue_fetch((index, rec, False, None))
+
+    def _queue_fetch(self, task):
+        with self._lock: self._to_fetch += 1
+        self.tasks.put(task)
+
+    def _fetch_done(self):
+        """Nada mais para buscar nem esperando leitura: as linhas retidas não têm mais com quem formar lote."""
+        with self._lock: return self._to_fetch == 0 and self.ready.empty()
+
+    def _running(self):
+        return not (self.stop_event.is_set() or self.finished.is_set())
+
+    def _take(self, q):
+        try: return q.get(timeout=WAIT_POLL * 2)
+        except queue.Empty: return None
+
+    def fetch_loop(self, driver, update_log_callback):
+        while self._running():
+            item = self._take(self.tasks)
+            if item is None: continue
+            index, rec, refresh, started = item
+            started = started or time.perf_counter()
+            try:
+                outcome = fetch_row(driver, self.source, rec, update_log_callback, refresh)
+                while self._running():
+                    try:
+                        self.ready.put((index, rec, outcome, refresh, started), timeout=WAIT_POLL * 2)
+                        break
+                    except queue.Full:
+                        continue
+            finally:
+                with self._lock: self._to_fetch -= 1
+
+    def parse_loop(self, update_log_callback):
+        while self._running():
+            item = self._take(self.ready)
+            if item is None:
+                if self._fetch_done(): self._flush_ai(update_log_callback)
+                continue
+            _, rec, outcome, _, _ = item
+            pairs = self.ai_pairs(rec, outcome[0]) if self.ai_pairs and not isinstance(outcome, dict) else []
+            if pairs:
+                with self._lock:
+                    self._held.append((item, pairs))
+                    full = len(self._held) >= self.ai_batch_size
+                if full or self._fetch_done(): self._flush_ai(update_log_callback)
+                continue
+            self._decide(item, update_log_callback)
+
+    def _flush_ai(self, update_log_callback):
+        with self._lock: held, self._held = self._held, []
+        if not held: return
+        self.ai_prime([pair for _, pairs in held for pair in pairs])
+        for item, _ in held: self._decide(item, update_log_callback)
+
+    def _decide(self, item, update_log_callback):
+        index, rec, outcome, refreshed, started = item
+        if isinstance(outcome, dict):
+            result = outcome
+        else:
+            log = lambda msg, room=rec["Room"]: update_log_callback(f"[Quarto {room}] {msg}")
+            email_text, from_cache = outcome
+            result = self.decide(rec, email_text, log)
+            if from_cache and not refreshed and result['Status'] == 'ERRO DE TARIFA':
+                # A confirmação pode ter mudado desde que foi guardada: volta para os navegadores
+                log("Divergência com texto em cache, buscando e-mail atualizado...")
+                self._queue_fetch((index, rec, True, started))
+                return
+        self._complete(index, result, started, update_log_callback)
+
+    def _complete(self, index, result, started, update_log_callback):
+        self.slots[index] = result
+        profiler.record('reserva', time.perf_counter() - started)
+        profiler.row_done()
+        try:
+            self.on_row_done(index, result)
+        except Exception as e:
+            # Falha ao gravar/repassar a linha (disco, sqlite travado, stdout fechado) não pode parar a thread de leitura
+            update_log_callback(f"Erro ao registrar o resultado da linha {index + 1}: {e}")
+        finally:
+            with self._lock:
+                self._remaining -= 1
+                if self._remaining == 0: self.finished.set()
+
+    def run(self, fetchers, update_log_callback, parse_workers=PARSE_WORKERS):
+        """fetchers: lista de (driver, log) — uma thread de busca por navegador e ao menos uma de leitura por navegador."""
+        if not self._remaining: return
+        threads = [threading.Thread(target=self.fetch_loop, args=f, daemon=True) for f in fetchers]
+        threads += [threading.Thread(target=self.parse_loop, args=(update_log_callback,), daemon=True) for _ in range(max(parse_workers, len(fetchers)))]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+def summarize_results(results_data):
+    """Separa os quartos por status, preservando a ordem do relatório."""
+    verified_correct = [r['Quarto'] for r in results_data if r['Status'] == 'CORRETO']
+    no_reference_rooms = [r['Quarto'] for r in results_data if r['Status'] == 'SEM REF.']
+    incorrect_rate_rooms = [r['Quarto'] for r in results_data if r['Status'] == 'ERRO DE TARIFA']
+    return verified_correct, no_reference_rooms, incorrect_rate_rooms
+
+def process_reservations(csv_paths, target_date_str, ignore_set, update_log_callback, update_progress_callback, on_complete_callback, stop_event, workers=1, debugger_addresses=None, email_cache=None, per_stay=False, ai_mode="background", on_result_callback=None, history=None, profile_path=None, fetch_backend="dom", journal=None, resume=False, driver_factory=None):
+    """
+    Confere as reservas dos CSVs contra os e-mails de confirmação.
+    Com workers > 1, cada worker usa o seu próprio navegador (um debugger_address por worker,
+    quando houver) ou uma aba nova na mesma sessão, consumindo uma fila compartilhada.
+    A leitura dos e-mails (regex/IA) roda em threads separadas, enquanto os navegadores já buscam
+    as próximas reservas (ver RowPipeline). O relatório mantém a ordem original dos CSVs.
+    email_cache (EmailCache) reaproveita os textos já lidos em execuções anteriores.
+    target_date_str aceita uma data ou um intervalo 'DD/MM/AAAA-DD/MM/AAAA'; com per_stay=True
+    cada reserva é conferida noite a noite entre Arrival e Departure. Nesses modos o e-mail é
+    lido uma vez por reserva e o relatório ganha uma coluna por noite.
+    ai_mode (ver AI_MODES) controla quando o modelo de IA de backup é carregado.
+    on_result_callback(index, resultado), se informado, recebe cada linha assim que é decidida.
+    history (AuditHistory) reaproveita os resultados CORRETO da execução anterior cujas reservas
+    não mudaram; as demais (alteradas, com erro ou novas) são conferidas de novo.
+    Os tempos de cada etapa ficam em 'profiler'; o resumo vai para o log e, com profile_path, para um JSON.
+    fetch_backend="rede" (ver FETCH_BACKENDS) busca os e-mails pelas requisições do próprio webmail (mail_api), várias
+    referências por vez, e usa a interface (DOM) só para as que falharem.
+    journal (RunJournal) grava cada reserva assim que é decidida; com resume=True a última execução
+    com as mesmas datas é retomada: reservas já finalizadas (e sem alteração) são puladas e só as
+    restantes e as com erro de busca/leitura (RETRY_STATUSES) vão para o navegador.
+    driver_factory(debugger_address, new_tab), se informado, substitui open_driver (ex: driver falso do bench/).
+    """
+    slots = []
+    worker_drivers = []
+
+    profiler.reset()
+    wait_timeouts.reset()
+    try:
+        update_log_callback("Inicializando...")
+        ai_reader.configure(ai_mode, update_log_callback)
+
+        # Datas, ingestão e pré-classificação antes de qualquer trabalho no navegador
+        try: audit_dates = parse_audit_dates(target_date_str)
+        except ValueError as e:
+            update_log_callback(str(e))
+            return
+        df = load_reservations(csv_paths, update_log_callback)
+        if df is None:
+            return
+        records = prepare_reservations(df, ignore_set).to_dict('records')
+        audit_key = "estadia" if per_stay else ",".join(audit_dates)
+        previous = history.load(str(r.get("Confirmation Number", "")).strip() for r in records) if history else {}
+        run_id, journaled, resumed_run = journal.start_run(audit_key, resume) if journal else (None, {}, False)
+        if resumed_run: update_log_callback(f"Retomando execução anterior: {len(journaled)} reserva(s) já registrada(s).")
+        elif resume and journal: update_log_callback("Nenhuma execução interrompida com estas datas: conferindo todas as reservas.")
+
+        slots = [None] * len(records)
+        pending = []
+        reused = resumed = 0
+        for index, rec in enumerate(records):
+            rec['_conf'] = str(rec.get("Confirmation Number", "")).strip()
+            rec['_fingerprint'] = reservation_fingerprint(rec, audit_key)
+            # Sem Confirmation Number a reserva fica no diário pela posição no CSV
+            rec['_journal_key'] = rec['_conf'] or f"#{index}"
+            last = previous.get(rec['_conf']) if rec['_conf'] else None
+            done_before = journaled.get(rec['_journal_key'])
+            if rec['_status']:
+                slots[index] = make_result(rec['Room'], rec['Name'], rec['External Reference'], rec['Rate'], '', rec['_status'])
+            elif done_before and done_before[0] == rec['_fingerprint'] and done_before[1].get('Status') not in RETRY_STATUSES:
+                slots[index] = done_before[1]
+                resumed += 1
+            elif last and last[0] == rec['_fingerprint'] and last[1].get('Status') == 'CORRETO':
+                slots[index] = last[1]
+                reused += 1
+            else:
+                pending.append((index, rec))
+                continue
+            if on_result_callback: on_result_callback(index, slots[index])
+        total_rows = len(pending)
+        update_log_callback(f"Total de reservas: {len(records)} | Sem necessidade de busca: {len(records) - total_rows - reused - resumed} | Sem alteração desde a última conferência: {reused}"
+                            + (f" | Já decididas na execução retomada: {resumed}" if resume else "") + f" | Para buscar: {total_rows}")
+        if total_rows == 0:
+            update_progress_callback(1.0, "Nenhuma reserva para buscar")
+            if journal: journal.finish_run(run_id)
+            return
+
+        workers = max(1, min(int(workers), total_rows))
+        addresses = list(debugger_addresses or [DEBUGGER_ADDRESS])
+        if driver_factory is None:
+            driver_path = ChromeDriverManager().install()
+            driver_factory = lambda address, new_tab: open_driver(address, driver_path, new_tab)
+        for i in range(workers):
+            new_tab = i >= len(addresses)
+            worker_drivers.append((driver_factory(addresses[i % len(addresses)], new_tab), new_tab))
+        update_log_callback(f"{workers} navegador(es) conectado(s)")
+
+        progress_lock = threading.Lock()
+        done = [0]
+        def on_row_done(index, result):
+            with progress_lock:
+                done[0] += 1
+                n = done[0]
+            update_progress_callback(n / total_rows, f"Processando {n} de {total_rows} ({int(n / total_rows * 100)}%)")
+            if result is None: return
+            if journal: journal.record(run_id, records[index]['_journal_key'], index, records[index]['_fingerprint'], result)
+            if history and records[index]['_conf']: history.save(records[index]['_conf'], records[index]['_fingerprint'], result)
+            if on_result_callback: on_result_callback(index, result)
+
+        network = MailApiBackend() if fetch_backend == "rede" else None
+        if network is not None and not network.configured:
+            update_log_callback("Busca pela rede sem endpoints configurados (MAIL_API em mail_api.py): usando a interface.")
+            network = None
+        source = EmailSource(email_cache, network)
+        if source.network is not None:
+            lookup_refs = list(dict.fromkeys(rec['External Reference'] for _, rec in pending))
+            update_log_callback(f"Buscando {len(lookup_refs)} referência(s) pela rede...")
+            # Cada navegador busca uma fatia das referências
+            slices = [lookup_refs[i::len(worker_drivers)] for i in range(len(worker_drivers))]
+            counts = [0] * len(slices)
+            def run_prefetch(i, driver):
+                counts[i] = source.prefetch(driver, slices[i], update_log_callback, stop_event)
+            prefetchers = [threading.Thread(target=run_prefetch, args=(i, d), daemon=True) for i, (d, _) in enumerate(worker_drivers)]
+            for t in prefetchers: t.start()
+            for t in prefetchers: t.join()
+            update_log_callback(f"{sum(counts)} de {len(lookup_refs)} e-mail(s) obtidos pela rede; o restante segue pela interface.")
+        if len(audit_dates) > 1 or per_stay:
+            update_log_callback("Modo multi-noites: " + ("estadia completa de cada reserva" if per_stay else f"{audit_dates[0]} a {audit_dates[-1]}"))
+        # Navegadores buscam, threads de leitura fazem regex/IA e comparam, ao mesmo tempo
+        decide = lambda rec, email_text, log: decide_row(rec, email_text, audit_dates, log, per_stay)
+        # As linhas que chegam à IA são respondidas em lotes (ver RowPipeline e SmartEmailReader.prime)
+        def ai_prime(pairs):
+            with profiler.stage('ia:lote'): ai_reader.prime(pairs)
+            profiler.count('ia:perguntas', len(pairs))
+        pipeline = RowPipeline(source, decide, slots, on_row_done, stop_event,
+                               ai_pairs=lambda rec, email_text: ai_pairs(email_text, stay_nights(rec) if per_stay else audit_dates), ai_prime=ai_prime)
+        for index, rec in pending: pipeline.add(index, rec)
+        fetchers = [(driver, update_log_callback if workers == 1 else (lambda msg, w=i + 1: update_log_callback(f"[N{w}] {msg}")))
+                    for i, (driver, _) in enumerate(worker_drivers)]
+        pipeline.run(fetchers, update_log_callback)
+
+        if stop_event.is_set():
+            update_log_callback("--- INTERROMPIDO ---" + (" (as reservas decididas ficaram no diário; use a retomada para continuar)" if journal else ""))
+        elif journal:
+            journal.finish_run(run_id)
+
+    except Exception as e:
+        update_log_callback(f"ERRO CRÍTICO GLOBAL: {str(e)}")
+    finally:
+        # Fecha apenas as abas abertas pelos workers; a sessão do usuário continua aberta.
+        # O processo do chromedriver de cada driver é encerrado (sem quit(), que fecharia o Chrome do usuário)
+        for driver, own_tab in worker_drivers:
+            if own_tab:
+                try: driver.close()
+                except Exception: pass
+            service = getattr(driver, 'service', None)
+            if service is not None:
+                try: service.stop()
+                except Exception: pass
+        results_data = [r for r in slots if r is not None]
+        verified_correct, no_reference_rooms, incorrect_rate_rooms = summarize_results(results_data)
+        profiler.finish()
+        for line in profiler.format_summary(): update_log_callback(line)
+        if profile_path:
+            try: profiler.export(profile_path)
+            except Exception as e: update_log_callback(f"Erro ao gravar perfil {profile_path}: {e}")
+        update_log_callback("--- FIM ---")
+        on_complete_callback(results_data, verified_correct, no_reference_rooms, incorrect_rate_rooms)
@@ -0,0 +1,119 @@
+# Modo headless (sem interface gráfica): para rodar a auditoria por agendador ou em servidor.
+# Ex: python ratecheck_cli.py --csv PAGINA1.csv PAGINA2.csv --date 05/12/2025 --ignore 101,102 --out resultado.csv
+import argparse
+import csv
+import json
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, date
+
+from email_cache import EmailCache, DEFAULT_CACHE_PATH
+from audit_store import AuditHistory, RunJournal, DEFAULT_HISTORY_PATH, DEFAULT_JOURNAL_PATH
+import ratecheck
+from ratecheck import process_reservations, parse_audit_dates, REPORT_COLUMNS, AI_MODES, FETCH_BACKENDS
+
+
+class ResultWriter:
+    """Grava cada linha do resultado assim que é decidida (CSV ou JSONL, pela extensão; '-' = JSONL no stdout)."""
+    def __init__(self, path, night_columns=(), per_stay=False):
+        self.jsonl = path == '-' or path.lower().endswith('.jsonl')
+        self._file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._writer = None
+        if not self.jsonl:
+            # No modo estadia cada reserva tem noites diferentes: vão juntas na coluna 'Noites'
+            self.fieldnames = ('Linha',) + REPORT_COLUMNS + tuple(night_columns) + (('Noites',) if per_stay else ())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+            self._writer.writeheader()
+
+    def write(self, index, result):
+        record = {'Linha': index + 1, **result}
+        with self._lock:
+            if self.jsonl:
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            else:
+                extra = {k: v for k, v in result.items() if k not in self.fieldnames}
+                if extra and 'Noites' in self.fieldnames:
+                    record['Noites'] = '; '.join(f"{k}={v}" for k, v in extra.items())
+                self._writer.writerow(record)
+            self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Verificador de Tarifas (modo headless)")
+    parser.add_argument('--csv', nargs='+', required=True, help="Arquivos CSV exportados do PMS")
+    parser.add_argument('--date', default=date.today().strftime("%d/%m/%Y"), help="Data Alvo (DD/MM/AAAA ou DD/MM/AAAA-DD/MM/AAAA)")
+    parser.add_argument('--ignore', default='', help="Quartos a ignorar, separados por vírgula")
+    parser.add_argument('--out', default='-', help="Arquivo de saída .csv ou .jsonl ('-' = JSONL no stdout)")
+    parser.add_argument('--per-stay', action='store_true', help="Confere todas as noites entre Arrival e Departure")
+    parser.add_argument('--workers', type=int, default=1, help="Navegadores em paralelo")
+    parser.add_argument('--debugger', action='append', help=f"Endereço do Chrome em depuração (padrão {ratecheck.DEBUGGER_ADDRESS}); pode repetir")
+    parser.add_argument('--no-cache', action='store_true', help="Não usa o cache de e-mails")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH)
+    parser.add_argument('--incremental', action='store_true', help="Reconfere só reservas alteradas ou com erro na execução anterior")
+    parser.add_argument('--history-path', default=DEFAULT_HISTORY_PATH)
+    parser.add_argument('--resume', action='store_true', help="Retoma a última execução com as mesmas datas: pula as reservas já decididas e refaz as com erro de busca/leitura")
+    parser.add_argument('--journal-path', default=DEFAULT_JOURNAL_PATH, help="Diário da execução (cada reserva é gravada assim que é decidida)")
+    parser.add_argument('--ai', choices=sorted(set(AI_MODES.values())), default='lazy', help="Carga da IA de backup")
+    parser.add_argument('--ai-int8', action='store_true', help="Quantização dinâmica int8 do modelo de IA")
+    parser.add_argument('--ai-threads', type=int, help="Threads do torch para a IA")
+    parser.add_argument('--fetch', choices=sorted(set(FETCH_BACKENDS.values())), default='dom', help="Busca dos e-mails: interface (dom) ou rede da sessão (rede, com a interface como alternativa)")
+    parser.add_argument('--profile', help="Grava o perfil de tempos por etapa (JSON) neste arquivo")
+    parser.add_argument('--fail-on-mismatch', action='store_true', help="Sai com código 2 se houver ERRO DE TARIFA")
+    return parser
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    ignore_set = {x.strip() for x in args.ignore.split(',') if x.strip()}
+    try: audit_dates = parse_audit_dates(args.date)
+    except ValueError as e: parser.error(str(e))
+    ratecheck.ai_reader.quantize = args.ai_int8
+    ratecheck.ai_reader.num_threads = args.ai_threads
+
+    writer = ResultWriter(args.out, audit_dates if len(audit_dates) > 1 and not args.per_stay else (), args.per_stay)
+    email_cache = None if args.no_cache else EmailCache(args.cache_path)
+    history = AuditHistory(args.history_path) if args.incremental else None
+    journal = RunJournal(args.journal_path)
+    stop_event = threading.Event()
+    outcome = {}
+
+    def on_complete(results, correct, no_ref, wrong_rate):
+        outcome.update(results=results, wrong_rate=wrong_rate)
+
+    worker = threading.Thread(target=process_reservations, args=(args.csv, args.date, ignore_set, log, lambda value, text: None, on_complete, stop_event),
+                              kwargs={'workers': args.workers, 'debugger_addresses': args.debugger, 'email_cache': email_cache,
+                                      'per_stay': args.per_stay, 'ai_mode': args.ai, 'on_result_callback': writer.write, 'history': history, 'profile_path': args.profile,
+                                      'fetch_backend': args.fetch, 'journal': journal, 'resume': args.resume})
+    worker.start()
+    try:
+        while worker.is_alive(): worker.join(0.5)
+    except KeyboardInterrupt:
+        log("Interrompendo...")
+        stop_event.set()
+        worker.join()
+    finally:
+        writer.close()
+        if email_cache: email_cache.close()
+        if history: history.close()
+        journal.close()
+
+    counts = Counter(r['Status'] for r in outcome.get('results', []))
+    log("Resumo: " + (", ".join(f"{status}: {n}" for status, n in counts.most_common()) or "nenhuma reserva processada"))
+    if stop_event.is_set(): return 130
+    if args.fail_on_mismatch and outcome.get('wrong_rate'): return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())